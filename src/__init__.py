@@ -2,7 +2,18 @@
 
 from importlib import reload
 import bpy
+from . import nProject
+from . import nPng
+from . import nImageCache
+from . import nBatch
 from . import nData
+from . import nCache
+from . import nRectGrid
+from . import nRectTable
+from . import nPreview
+from . import nLibrary
+from . import nWatch
+from . import nLiveLink
 from . import nMath
 from . import nInterface
 from . import nUv
@@ -31,7 +42,18 @@ bl_info = {
 }
 
 modules = (
+    nProject,
+    nPng,
+    nImageCache,
+    nBatch,
     nData,
+    nCache,
+    nRectGrid,
+    nRectTable,
+    nPreview,
+    nLibrary,
+    nWatch,
+    nLiveLink,
     nInterface,
     nMath,
     nUv,
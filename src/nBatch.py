@@ -0,0 +1,227 @@
+# region Imports
+
+import importlib
+import multiprocessing
+import os
+import sys
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# worker processes are plain python without bpy, where this module is imported as part of the worker package instead
+# of the addon package. tools import it on its own
+if __package__:
+    from . import nProject
+    from . import nPng
+    from . import nImageCache
+else:
+    import nProject
+    import nPng
+    import nImageCache
+
+# endregion
+
+# region Settings
+
+# worker processes import this module and the ones it needs as submodules of a package of this name, made up on the
+# spot from the addon folder, instead of under their bare names where they could clash with modules of other addons.
+# blender imports them the same way to send work to the workers and read their results
+worker_package = "neotilemap_worker"
+
+# sets up the worker package, run on every worker process before it's sent anything. it has to be run by a standard
+# library function since nothing of the addon can be imported before
+worker_bootstrap = """
+import importlib.machinery
+import importlib.util
+import sys
+
+spec = importlib.machinery.ModuleSpec(name, None, is_package=True)
+spec.submodule_search_locations = [directory]
+sys.modules[name] = importlib.util.module_from_spec(spec)
+"""
+
+# starting worker processes takes a while, fewer previews than this are decoded on the calling process instead
+min_process_pngs = 32
+
+# each worker process is handed this many batches of pngs to decode, so a slow batch doesn't hold up the rest
+batches_per_worker = 4
+
+
+class PreparedProject:
+    """A project file parsed by prepare_project, so importing it doesn't read its sidecar or hash its rects again.
+
+    Results from worker processes are instances of the classes of the modules in the worker package, rather than of
+    the addon package, they have the same attributes.
+
+    Attributes:
+        error (str): Why the project couldn't be read, or None if it was prepared.
+        sidecar (ProjectSidecar): The sidecar of the project file as it was when it was prepared.
+        content_hashes (list): The nProject.hash_rect of each rect in file order.
+    """
+
+    def __init__(self, error, sidecar=None, content_hashes=None):
+        self.error = error
+        self.sidecar = sidecar
+        self.content_hashes = content_hashes
+
+# endregion
+
+# region Methods
+
+
+def prepare_project(filepath, sidecar_path, cache_directory=None, cache_bytes=0, allow_slow_filters=True):
+    """Parses a project file, writes its sidecar and hashes its rects, so importing it afterwards doesn't need to hash
+    or walk the file. Runs in a worker process.
+
+    Args:
+        filepath (str): The path of the project file.
+        sidecar_path (str): The path of the projects sidecar.
+        cache_directory (str): The image cache folder to decode the previews into, or None to not decode them.
+        cache_bytes (int): The size cap of the image cache.
+        allow_slow_filters (bool): Whether to decode previews using the average or paeth filter, only worth it on a
+            worker process. Otherwise they're left for Blender to decode.
+
+    Returns:
+        PreparedProject: The parsed project.
+    """
+    try:
+        sidecar = nProject.ProjectSidecar.read(sidecar_path)
+
+        with nProject.ProjectReader(filepath) as reader:
+            if sidecar is None or not sidecar.is_valid_for(filepath):
+                hashes = {c.name: reader.hash_chunk(c) for c in reader.chunks}
+
+                uvs_chunk = reader.get_chunk("uvs")
+                uvs = reader.read_uvs(uvs_chunk) if uvs_chunk is not None else None
+
+                sidecar = nProject.ProjectSidecar.from_project(filepath, reader.version, reader.chunks, hashes, uvs)
+                sidecar.write(sidecar_path)
+
+            uvs = reader.read_uvs_from_sidecar(sidecar)
+            content_hashes = [nProject.hash_rect(v, p) for v, p in zip(uvs.verts, uvs.previews)]
+
+            if cache_directory is not None:
+                decode_previews(uvs, cache_directory, cache_bytes, allow_slow_filters)
+    except (nProject.ProjectFileError, OSError) as e:
+        return PreparedProject(str(e))
+
+    return PreparedProject(None, sidecar, content_hashes)
+
+
+def decode_previews(uvs, cache_directory, cache_bytes, allow_slow_filters=True):
+    """Decodes the previews of a uvs chunk into the image cache, skipping those that are already cached."""
+    cache = nImageCache.ImageCache(cache_directory, cache_bytes)
+    seen = set()
+
+    for preview_hash, png in zip(uvs.preview_hashes, uvs.previews):
+        key = preview_hash.hex()
+        if key in seen or cache.contains(key):
+            continue
+
+        seen.add(key)
+
+        try:
+            cache.put(key, nPng.decode(png, allow_slow_filters=allow_slow_filters))
+        except (nPng.PngError, zlib.error, ValueError):
+            pass
+
+
+def prepare_projects(jobs, worker_count):
+    """Prepares project files in parallel on a process pool, falling back to threads if processes can't be started.
+
+    Args:
+        jobs (list): The prepare_project arguments of each project.
+        worker_count (int): The number of worker processes, 0 uses one per cpu core.
+
+    Returns:
+        list: The result of prepare_project for each job, in order.
+    """
+    if worker_count < 1:
+        worker_count = os.cpu_count() or 1
+
+    worker_count = min(worker_count, len(jobs))
+    # on this process, decoding slow pngs would hold the GIL for blender as well
+    if worker_count <= 1:
+        return [prepare_project(*j, allow_slow_filters=False) for j in jobs]
+
+    try:
+        worker = get_worker_module()
+
+        with create_process_pool(worker_count) as pool:
+            return list(pool.map(worker.prepare_project, *zip(*jobs)))
+    except Exception as e:
+        print("Couldn't prepare projects on worker processes, using threads instead: " + str(e))
+
+    with ThreadPoolExecutor(max_workers=worker_count) as pool:
+        return list(pool.map(lambda j: prepare_project(*j, allow_slow_filters=False), jobs))
+
+
+def decode_pngs(pngs):
+    """Decodes pngs into uint8 PngImages, which take a quarter of the memory to send back. Runs in a worker process,
+    where the average and paeth filter don't hold up Blender.
+
+    Returns:
+        list: The decoded PngImage of each png, None where a png couldn't be decoded.
+    """
+    decoded = []
+
+    for png in pngs:
+        try:
+            decoded.append(nPng.decode(png, as_float=False))
+        except (nPng.PngError, zlib.error, ValueError):
+            decoded.append(None)
+
+    return decoded
+
+
+def decode_pngs_on_processes(pngs, worker_count):
+    """Decodes pngs with decode_pngs on a process pool.
+
+    Args:
+        pngs (list): The png data to decode, as bytes since memory mapped views can't be sent to other processes.
+        worker_count (int): The number of worker processes, 0 uses one per cpu core.
+
+    Returns:
+        list: The decoded PngImage of each png in order, None where a png couldn't be decoded. None if the worker
+            processes couldn't be started.
+    """
+    if worker_count < 1:
+        worker_count = os.cpu_count() or 1
+
+    batch_count = min(len(pngs), worker_count * batches_per_worker)
+    batches = [pngs[i * len(pngs) // batch_count:(i + 1) * len(pngs) // batch_count] for i in range(batch_count)]
+
+    try:
+        worker = get_worker_module()
+
+        with create_process_pool(min(worker_count, batch_count)) as pool:
+            return [d for batch in pool.map(worker.decode_pngs, batches) for d in batch]
+    except Exception as e:
+        print("Couldn't decode previews on worker processes: " + str(e))
+
+    return None
+
+
+def create_process_pool(worker_count):
+    """Returns a process pool whose workers can import the modules returned by get_worker_module."""
+    # fork would copy all of blender, spawn starts clean interpreters
+    return ProcessPoolExecutor(max_workers=worker_count, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=exec, initargs=(worker_bootstrap, get_bootstrap_globals()))
+
+
+def get_addon_directory():
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+def get_bootstrap_globals():
+    return {"name": worker_package, "directory": get_addon_directory()}
+
+
+def get_worker_module():
+    """Returns this module imported into the worker package, the way worker processes import it. The addon folder is
+    never put on the import path, so neither Blender nor other addons see our modules under their bare names."""
+    if worker_package not in sys.modules:
+        exec(worker_bootstrap, get_bootstrap_globals())
+
+    return importlib.import_module(worker_package + "." + __name__.rpartition(".")[2])
+
+# endregion
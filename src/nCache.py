@@ -0,0 +1,77 @@
+# region Imports
+
+import bpy
+
+# endregion
+
+# region Settings
+
+# dictionaries of data derived from collections by collection key, see register_cache
+caches = []
+
+# endregion
+
+# region Methods
+
+
+def get_key(collection):
+    """Returns the key a collection's derived data is cached under, unique across scenes and linked libraries."""
+    return collection.id_data.name_full, collection.name
+
+
+def register_cache(cache):
+    """Adds a dictionary keyed by get_key to the caches that are freed when their collection is deleted, and cleared
+    when undo or loading a file replaces the collections.
+
+    Entries should store the generation of the collection they were derived at and be rebuilt when it differs.
+
+    Returns:
+        dict: The cache.
+    """
+    if not any(c is cache for c in caches):
+        caches.append(cache)
+
+    return cache
+
+
+def free_deleted():
+    """Frees the cached data of collections that don't exist anymore."""
+    alive = {get_key(c) for scene in bpy.data.scenes for c in getattr(scene, "nuv_uvSets", ())}
+
+    for cache in caches:
+        for key in [k for k in cache if k not in alive]:
+            del cache[key]
+
+
+def free_all():
+    for cache in caches:
+        cache.clear()
+
+
+# undo and loading replace the collections, possibly with ones at a generation something was already derived at
+@bpy.app.handlers.persistent
+def on_data_replaced(*_):
+    free_all()
+
+# endregion
+
+# region Blender
+
+
+def get_handlers():
+    return bpy.app.handlers.load_post, bpy.app.handlers.undo_post, bpy.app.handlers.redo_post
+
+
+def register():
+    for h in get_handlers():
+        h.append(on_data_replaced)
+
+
+def unregister():
+    for h in get_handlers():
+        if on_data_replaced in h:
+            h.remove(on_data_replaced)
+
+    free_all()
+
+# endregion
@@ -3,11 +3,45 @@
 import bpy
 import os
 import tempfile
-import struct
 import math
+import hashlib
+import zlib
+import time
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from bpy_extras.io_utils import ImportHelper
 from pathlib import Path
 from bpy.props import *
+from . import nProject
+from . import nPng
+from . import nImageCache
+from . import nBatch
+from . import nCache
+from . import nRectTable
+
+# endregion
+
+# region Settings
+
+# the largest preview and icon written for rect preview images, matching the sizes Blender renders them at
+preview_image_size = 128
+preview_icon_size = 32
+
+# custom property marking preview images whose icon pixels have been written
+preview_icon_tag = "nuv_preview_icon"
+
+# custom property marking atlas and preview images created by an import, which are removed once unused
+managed_image_tag = "nuv_managed"
+
+# rects and chunks store where they are in their project file in int properties, which are 32 bit
+max_project_bytes = 2 ** 31 - 1
+
+# yielded by import steps once they start changing the collection, they can't be cancelled from then on
+commit_step = "COMMIT"
+
+# how many rects an import writes to a collection between yields
+commit_slice_rects = 256
 
 # endregion
 
@@ -57,6 +91,31 @@ def rect_to_tuples(rect):
             (rect.bottomRightX, rect.bottomRightY)]
 
 
+def rect_key(rect):
+    """Returns the vertex key of a rect, matching nProject.rect_key for the same vertices in file order."""
+    return nProject.rect_key((rect.topLeftX, rect.topLeftY,
+                              rect.topRightX, rect.topRightY,
+                              rect.bottomRightX, rect.bottomRightY,
+                              rect.bottomLeftX, rect.bottomLeftY))
+
+
+def rect_id(rect):
+    """Returns the stable id of a rect, matching nProject.rect_id for the same vertices in file order."""
+    return nProject.rect_id((rect.topLeftX, rect.topLeftY,
+                             rect.topRightX, rect.topRightY,
+                             rect.bottomRightX, rect.bottomRightY,
+                             rect.bottomLeftX, rect.bottomLeftY))
+
+
+def build_rect_index(collection):
+    """Returns a dictionary of rect indices in the collection by rect key. The first of any duplicate rects wins."""
+    index = {}
+    for i, rect in enumerate(collection.get_items()):
+        index.setdefault(rect_key(rect), i)
+
+    return index
+
+
 def are_rects_same(a, b):
     """Returns true if Rect A and Rect B have the same vertex positions"""
     return (
@@ -83,6 +142,230 @@ def get_collection_by_idx(idx):
     return bpy.context.scene.nuv_uvSets[idx]
 
 
+def copy_property_group(source, target):
+    """Copies every property of a property group to another of the same type, including nested collections."""
+    for prop in source.bl_rna.properties:
+        name = prop.identifier
+        if name == "rna_type":
+            continue
+
+        if prop.type == "COLLECTION":
+            target_items = getattr(target, name)
+            target_items.clear()
+
+            for item in getattr(source, name):
+                copy_property_group(item, target_items.add())
+        elif not prop.is_readonly:
+            setattr(target, name, getattr(source, name))
+
+# endregion
+
+# region Image Cache Methods
+
+
+# module level so cached images stay warm when switching blend files
+image_cache = None
+
+
+def get_image_cache_directory():
+    return os.path.join(bpy.utils.user_resource('DATAFILES'), "neotilemap_cache")
+
+
+def get_image_cache(settings):
+    """Returns the decoded image cache configured from the scene settings, or None if caching is disabled."""
+    global image_cache
+
+    if not settings.cache_enabled:
+        return None
+
+    directory = get_image_cache_directory()
+    max_disk_bytes = settings.cache_size * 1024 * 1024
+
+    if image_cache is None:
+        image_cache = nImageCache.ImageCache(directory, max_disk_bytes)
+    else:
+        image_cache.configure(directory, max_disk_bytes)
+
+    return image_cache
+
+
+# endregion
+
+# region Project Sidecar Methods
+
+
+# parsed sidecar headers by sidecar path, so the sidebar doesn't read them on every redraw
+sidecar_headers = {}
+
+
+def get_sidecar_path(filepath):
+    """Returns where the parsed sidecar of a project file is stored in the user cache."""
+    key = hashlib.sha1(os.path.abspath(filepath).encode("utf-8")).hexdigest()
+    return os.path.join(bpy.utils.user_resource('DATAFILES'), "neotilemap_projects", key + ".ntps")
+
+
+def read_sidecar(filepath, header_only=False):
+    """Returns the sidecar of a project file if it's still valid for the file on disk, otherwise None."""
+    path = get_sidecar_path(filepath)
+
+    if header_only:
+        sidecar = sidecar_headers.get(path)
+        if sidecar is None:
+            sidecar = nProject.ProjectSidecar.read(path, header_only=True)
+            if sidecar is None:
+                return None
+
+            sidecar_headers[path] = sidecar
+    else:
+        sidecar = nProject.ProjectSidecar.read(path)
+
+    if sidecar is None or not sidecar.is_valid_for(filepath):
+        return None
+
+    return sidecar
+
+
+def write_sidecar(filepath, sidecar):
+    path = get_sidecar_path(filepath)
+
+    try:
+        sidecar.write(path)
+    except OSError as e:
+        print("Couldn't write the project sidecar for \"" + filepath + "\": " + str(e))
+
+    sidecar_headers.pop(path, None)
+
+
+def get_project_state(filepath, collection):
+    """Returns "CURRENT" if a collection holds the project file as it is on disk and "MODIFIED" if it doesn't, going by
+    the sidecar of the file, or "UNKNOWN" if it doesn't have a sidecar to tell.
+
+    The sidecar is shared by every blend file, so it's compared with the chunk index of the collection as well.
+    """
+    path = get_sidecar_path(filepath)
+
+    sidecar = sidecar_headers.get(path)
+    if sidecar is None:
+        sidecar = nProject.ProjectSidecar.read(path, header_only=True)
+        if sidecar is None:
+            return "UNKNOWN"
+
+        sidecar_headers[path] = sidecar
+
+    if not sidecar.is_valid_for(filepath) or not ImportRectData.is_up_to_date(collection, sidecar):
+        return "MODIFIED"
+
+    return "CURRENT"
+
+
+# endregion
+
+# region Image Storage Methods
+
+
+# folder next to the blend file that externally stored images are written to
+external_image_folder = "neotilemap_images"
+
+
+def get_external_image_directory():
+    """Returns the shared folder for externally stored images, or None if the blend file hasn't been saved."""
+    if not bpy.data.filepath:
+        return None
+
+    return os.path.join(os.path.dirname(bpy.data.filepath), external_image_folder)
+
+
+def get_storage_directory(collection):
+    """Returns the folder to store the images of a collection in, or None if they should be packed."""
+    if collection.storage_mode != "EXTERNAL":
+        return None
+
+    directory = get_external_image_directory()
+    if directory is None:
+        print("The blend file hasn't been saved, packing the images of \"" + collection.name + "\" instead.")
+
+    return directory
+
+
+def write_external_image(directory, data):
+    """Writes png data to the external image folder under its content hash, unless it's already there.
+
+    Returns:
+        str: The path of the png.
+    """
+    key = hashlib.sha256(data).hexdigest()
+    path = os.path.join(directory, key[:2], key + ".png")
+
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    return path
+
+
+# endregion
+
+# region Image Garbage Collection Methods
+
+
+def is_managed_image(image):
+    """Returns whether an image was created by importing a project."""
+    if image.get(managed_image_tag):
+        return True
+
+    # preview images from before images were tagged
+    return image.name.startswith(".Atlas_") and "_Preview" in image.name
+
+
+def get_referenced_image_names():
+    """Returns the names of every local atlas and preview image used by a collection in any local scene."""
+    names = set()
+
+    for scene in bpy.data.scenes:
+        if scene.library is not None:
+            continue
+
+        for collection in scene.nuv_uvSets:
+            # linked collections use the images from their library
+            if collection.is_linked():
+                continue
+
+            names.add("Atlas_" + collection.name)
+            names.update(r.previewName for r in collection.items)
+
+    return names
+
+
+def purge_unused_images():
+    """Removes the atlas and preview images that no collection references anymore.
+
+    Images that are used by anything other than their fake user, like a material using an atlas, are kept.
+
+    Returns:
+        tuple: The number of images removed and the number of packed bytes reclaimed.
+    """
+    referenced = get_referenced_image_names()
+    removed = 0
+    reclaimed = 0
+
+    for image in [i for i in bpy.data.images if i.name not in referenced and is_managed_image(i)]:
+        # linked images belong to their library
+        if image.library is not None or image.users > (1 if image.use_fake_user else 0):
+            continue
+
+        if image.packed_file is not None:
+            reclaimed += image.packed_file.size
+
+        bpy.data.images.remove(image)
+        removed += 1
+
+    return removed, reclaimed
+
+
 # endregion
 
 # region Property Groups
@@ -108,6 +391,11 @@ class NeoTileRect(bpy.types.PropertyGroup):
     """Contains data for a UV rect and preview image as a Blender type."""
 
     previewName: StringProperty(name="Preview Name")
+    contentHash: StringProperty(name="Content Hash")
+
+    # where the preview png is in the project file, for creating the preview image lazily
+    previewOffset: IntProperty(name="Preview Offset")
+    previewLength: IntProperty(name="Preview Length")
 
     topLeftX: FloatProperty(name="Top Left X")
     topLeftY: FloatProperty(name="Top Left Y")
@@ -138,22 +426,30 @@ class NeoTileRect(bpy.types.PropertyGroup):
 class NeoTilePatternEntry(NeoTileRect):
     rect_idx: IntProperty(default=-1)
 
-    def try_discover_rect_idx(self, collection):
-        items = collection.items.items()
-        items_len = len(items)
+    # the id of the rect, which finds it again wherever it moved to when the rects change
+    rect_id: StringProperty(name="Rect Id")
+
+    def try_discover_rect_idx(self, collection, id_index=None):
+        """Finds the rect in the collection with the same vertices as this entry.
+
+        Args:
+            collection (NeoTileRectCollection): The collection to search.
+            id_index (dict): The rect indices of the collection by rect id from RectTable.get_id_index, taken from
+                the rect table if not provided.
+        """
+        if id_index is None:
+            id_index = nRectTable.get_table(collection).get_id_index()
 
-        self.rect_idx = -1
-        for i in range(items_len):
-            rect = items[i][1]
+        # entries from before rects had ids
+        if not self.rect_id:
+            self.rect_id = rect_id(self)
 
-            if are_rects_same(self, rect):
-                self.rect_idx = i
-                return
+        self.rect_idx = id_index.get(self.rect_id, -1)
 
     def get_rect(self, collection):
-        items = collection.items.items()
+        items = collection.get_items()
 
-        if -1 < self.rect_idx < len(items): return items[self.rect_idx][1]
+        if -1 < self.rect_idx < len(items): return items[self.rect_idx]
         return None
 
 
@@ -164,21 +460,27 @@ class NeoTileRectPattern(bpy.types.PropertyGroup):
     reset_stroke_on_click: BoolProperty(default=True, description="Whether the pattern index will be reset when starting a new stroke. When shift is held, this option will be inverted.")
     allow_repaint: BoolProperty(default=True, description="Whether faces that have already been painted can be painted on again.")
 
-    def update_pattern_indicies(self, collection):
+    def update_pattern_indicies(self, collection, id_index=None):
+        if id_index is None:
+            id_index = nRectTable.get_table(collection).get_id_index()
+
         for item in self.items:
-            item.try_discover_rect_idx(collection)
+            item.try_discover_rect_idx(collection, id_index)
 
     def add_rect(self):
         self.items.add()
 
-    def set_rect(self, collection_idx, item_idx, rect_idx):
-        items = self.items.items()
+    def get_rect_indices(self):
+        """Returns the rect index of every entry, so painting doesn't read the entries per face."""
+        return [item.rect_idx for item in self.items]
 
+    def set_rect(self, collection_idx, item_idx, rect_idx):
         collection = get_collection_by_idx(collection_idx)
 
         rect = collection.get_rect(rect_idx)
-        pattern_rect = items[item_idx][1]
+        pattern_rect = self.items[item_idx]
         pattern_rect.rect_idx = rect_idx
+        pattern_rect.rect_id = rect_id(rect)
 
         copy_rect(rect, pattern_rect)
 
@@ -189,12 +491,51 @@ class NeoTileRectPattern(bpy.types.PropertyGroup):
         self.items.remove(pattern_rect_idx)
 
 
+class NeoTileChunk(bpy.types.PropertyGroup):
+    """Contains the location and content hash of a chunk from the project file a collection was imported from."""
+
+    name: StringProperty(name="Name")
+    offset: IntProperty(name="Offset")
+    length: IntProperty(name="Length")
+    contentHash: StringProperty(name="Content Hash")
+
+
+class NeoTileImageRef(bpy.types.PropertyGroup):
+    """References an image used by a published collection, so linking the collection links its images too."""
+
+    image: PointerProperty(type=bpy.types.Image)
+
+
 class NeoTileRectCollection(bpy.types.PropertyGroup):
     """Contains data for a collection of rects.
     """
     name: StringProperty(name="Name")
     relative_path: StringProperty(name="Path")
+    library_scene: PointerProperty(name="Library Scene", type=bpy.types.Scene,
+                                   description="The linked library scene the rects of this collection are read from.")
+    image_refs: CollectionProperty(type=NeoTileImageRef)
+    project_version: IntProperty(name="Project Version")
+    chunks: CollectionProperty(type=NeoTileChunk)
+    preview_source: StringProperty(name="Preview Source")
+
+    # the storage the images were last written with, storage_mode only applies on the next reload
+    image_storage: StringProperty(name="Image Storage")
+    storage_mode: EnumProperty(
+        name="Storage",
+        description="How the images of the tile map are stored. Changes apply the next time it's reloaded.",
+        items=(
+            ("PACKED", "Packed", "Pack the images into the blend file."),
+            ("EXTERNAL", "External", "Write the images to a folder shared by the blend files next to this one and reference them by relative path.")
+        ),
+        default="PACKED"
+    )
     items: CollectionProperty(type=NeoTileRect)
+
+    # bumped whenever the rects or their previews change, so anything derived from them knows to derive it again, see
+    # nCache. pattern_generation is bumped whenever the patterns change, so editing them doesn't invalidate the rects
+    generation: IntProperty(name="Generation")
+    pattern_generation: IntProperty(name="Pattern Generation")
+
     patterns: CollectionProperty(type=NeoTileRectPattern)
     active_pattern: IntProperty(default=-1)
     expanded: BoolProperty(name="Expanded")
@@ -204,11 +545,11 @@ class NeoTileRectCollection(bpy.types.PropertyGroup):
 
     def add_pattern(self):
         self.patterns.add()
-        self.active_pattern = len(self.patterns.items()) - 1
+        self.active_pattern = len(self.patterns) - 1
+        self.bump_pattern_generation()
 
     def remove_pattern(self):
-        items = self.patterns.items()
-        items_len = len(items)
+        items_len = len(self.patterns)
 
         if -1 < self.active_pattern < items_len:
             self.patterns.remove(self.active_pattern)
@@ -218,29 +559,90 @@ class NeoTileRectCollection(bpy.types.PropertyGroup):
         if self.active_pattern > items_len - 1:
             self.active_pattern = items_len - 1
 
+        self.bump_pattern_generation()
+
     def move_pattern(self, pattern_idx, amount):
         self.patterns.move(pattern_idx, pattern_idx - amount)
+        self.bump_pattern_generation()
 
     def get_active_pattern(self):
-        if self.active_pattern < 0:
-            return None
-
-        items = self.patterns.items()
-        if self.active_pattern > len(items) - 1:
+        if self.active_pattern < 0 or self.active_pattern > len(self.patterns) - 1:
             return None
 
-        return items[self.active_pattern][1]
+        return self.patterns[self.active_pattern]
 
     def update_pattern_indicies(self):
+        id_index = nRectTable.get_table(self).get_id_index()
+
         for p in self.patterns:
-            p.update_pattern_indicies(self)
+            p.update_pattern_indicies(self, id_index)
 
     def get_rect(self, rect_idx):
-        items = self.items.items()
-        return items[rect_idx][1]
+        return self.get_items()[rect_idx]
+
+    def get_source(self):
+        """Returns the collection the rects are read from, the collection in its library when it's linked."""
+        if self.library_scene is not None:
+            source = self.library_scene.nuv_uvSets.get(self.name)
+            if source is not None:
+                return source
+
+        return self
+
+    def get_items(self):
+        """Returns the rects of the collection, read from its library when it's linked."""
+        return self.get_source().items
+
+    def is_linked(self):
+        return self.library_scene is not None
+
+    def get_image(self, name):
+        """Returns an atlas or preview image used by the collection, from its library when it's linked."""
+        if self.library_scene is not None and self.library_scene.library is not None:
+            return bpy.data.images.get((name, self.library_scene.library.filepath))
+
+        return bpy.data.images.get(name)
+
+    def get_chunk(self, name):
+        """Returns the index entry of a chunk from the last import, or None if it wasn't imported."""
+        for c in self.chunks:
+            if c.name == name:
+                return c
+
+        return None
+
+    def get_chunk_hash(self, name):
+        """Returns the content hash of a chunk from the last import, or an empty string if it wasn't imported."""
+        c = self.get_chunk(name)
+        return c.contentHash if c is not None else ""
+
+    def set_chunk_index(self, chunks, hashes):
+        """Stores the chunk index of the project file the collection was imported from.
+
+        Args:
+            chunks (list): The ProjectFileContent of each chunk.
+            hashes (dict): The content hash of each chunk, by chunk name.
+        """
+        self.chunks.clear()
+        for c in chunks:
+            entry = self.chunks.add()
+            entry.name = c.name
+            entry.offset = c.dataAddress
+            entry.length = c.dataLen
+            entry.contentHash = hashes.get(c.name, "")
+
+    def bump_generation(self):
+        """Marks the rects as changed. Everything that changes the rects or their previews calls this."""
+        self.generation += 1
+
+    def bump_pattern_generation(self):
+        """Marks the patterns as changed. Everything that changes the patterns or their entries calls this."""
+        self.pattern_generation += 1
 
     def clear(self):
         self.items.clear()
+        self.chunks.clear()
+        self.bump_generation()
 
 # endregion
 
@@ -296,7 +698,7 @@ class NeoTileMovePattern(bpy.types.Operator):
         collection.move_pattern(self.patternIdx, amount)
         collection.active_pattern -= amount
 
-        patterns_len = len(collection.patterns.items())
+        patterns_len = len(collection.patterns)
         if collection.active_pattern < 0: collection.active_pattern = 0
         if collection.active_pattern > patterns_len - 1: collection.active_pattern = patterns_len - 1
 
@@ -316,12 +718,12 @@ class NeoTileAddPatternRect(bpy.types.Operator):
         collection =  get_collection_by_idx(self.collectionIdx)
         pattern = collection.get_active_pattern()
         pattern.add_rect()
+        collection.bump_pattern_generation()
 
-        items = pattern.items.items()
         bpy.ops.view3d.nuv_set_pattern_rect_selector(
             "INVOKE_DEFAULT",
             collectionIdx=self.collectionIdx,
-            patternRectIdx=len(items) - 1)
+            patternRectIdx=len(pattern.items) - 1)
 
         return {'FINISHED'}
 
@@ -342,6 +744,8 @@ class NeoTileSetPatternRect(bpy.types.Operator):
         pattern = collection.get_active_pattern()
 
         pattern.set_rect(self.collectionIdx, self.patternRectIdx, self.rectIdx)
+        collection.bump_pattern_generation()
+
         return {'FINISHED'}
 
 
@@ -360,6 +764,7 @@ class NeoTileDeletePatternRect(bpy.types.Operator):
         pattern = collection.get_active_pattern()
 
         pattern.delete_rect(self.patternRectIdx)
+        collection.bump_pattern_generation()
 
         return {'FINISHED'}
 
@@ -380,6 +785,7 @@ class NeoTileMovePatternRect(bpy.types.Operator):
         pattern = collection.get_active_pattern()
 
         pattern.move_rect(self.patternRectIdx, 1 if self.up else -1)
+        collection.bump_pattern_generation()
 
         return {'FINISHED'}
 
@@ -396,6 +802,38 @@ class NeoTileDeleteCollection(bpy.types.Operator):
 
         bpy.ops.ed.undo_push(message="Delete NeoTileMap")
         get_collections().remove(self.collectionIdx)
+        nCache.free_deleted()
+        purge_unused_images()
+
+        return {'FINISHED'}
+
+
+class NeoTilePurgeImages(bpy.types.Operator):
+    bl_idname = "neo.uvset_purge_images"
+    bl_label = "Purge Unused Images"
+    bl_description = "Removes atlas and preview images that no tile map uses anymore."
+    bl_options = {"REGISTER", "UNDO"}
+
+    def invoke(self, context, event):
+        removed, reclaimed = purge_unused_images()
+        self.report({"INFO"}, "Removed " + str(removed) + " unused images, reclaimed " +
+                    str(round(reclaimed / (1024 * 1024), 2)) + " MB.")
+
+        return {'FINISHED'}
+
+
+class NeoTileClearImageCache(bpy.types.Operator):
+    bl_idname = "neo.uvset_clear_image_cache"
+    bl_label = "Clear Image Cache"
+    bl_description = "Removes every decoded image from the image cache."
+
+    def invoke(self, context, event):
+        cache = get_image_cache(context.scene.nuv_settings)
+        if cache is None:
+            cache = nImageCache.ImageCache(get_image_cache_directory(), 0)
+
+        cache.clear()
+        self.report({"INFO"}, "Cleared the image cache.")
 
         return {'FINISHED'}
 
@@ -418,29 +856,184 @@ class ImportRectData(bpy.types.Operator, ImportHelper):
     )
 
     @staticmethod
-    def add_image(file_path, name):
-        """Adds an image to the blend file, replacing it if it already exists.
+    def add_image(png, name, decoded=None, directory=None):
+        """Adds an image to the blend file from in memory png data, replacing it if it already exists.
+        Without decoded pixels the png data is packed as is, so Blender decodes it on first use. Decoding goes through
+        the image cache before this, see load_decoded.
 
         Args:
-            file_path (str): The filepath of the image to add.
+            png (bytes): The png data of the image to add, or None to encode the decoded pixels.
             name (str): The name to give the image in the blend file
+            decoded (PngImage): The already decoded png, if available.
+            directory (str): The folder to store the image in instead of packing it, from get_storage_directory.
+
+        Returns:
+            bpy.types.Image: The added image.
         """
 
-        # delete image if it already exists
-        for i in bpy.data.images:
-            if i.name == name:
-                i.filepath = file_path
-                i.reload()
-                i.pack()
-                i.use_fake_user = True
+        image = bpy.data.images.get(name)
 
-                return
+        if directory is not None:
+            path = write_external_image(directory, bytes(png) if png is not None else nPng.encode_image(decoded))
+
+            if image is None:
+                image = bpy.data.images.new(name, 1, 1, alpha=True)
+
+            image.source = "FILE"
+            image.filepath = bpy.path.relpath(path)
+
+            # drop the packed copy, the image reads from its file from now on
+            if image.packed_file is not None:
+                image.unpack(method="REMOVE")
+
+            image.reload()
+        elif decoded is not None:
+            if image is None:
+                image = bpy.data.images.new(name, decoded.width, decoded.height, alpha=True)
+            elif tuple(image.size) != (decoded.width, decoded.height):
+                image.scale(decoded.width, decoded.height)
+
+            image.pixels.foreach_set(decoded.pixels)
+            image.pack()
+        else:
+            data = bytes(png)
+
+            if image is None:
+                image = bpy.data.images.new(name, 1, 1, alpha=True)
+
+            image.pack(data=data, data_len=len(data))
+            image.source = "FILE"
+            image.reload()
 
-        image = bpy.data.images.load(file_path)
-        image.name = name
-        image.reload()
-        image.pack()
         image.use_fake_user = True
+        image[managed_image_tag] = True
+
+        return image
+
+    @staticmethod
+    def set_preview_icon(image, decoded):
+        """Writes the preview and icon pixels of an image directly, so Blender never has to render them.
+
+        Args:
+            image (bpy.types.Image): The image to write the preview of.
+            decoded (PngImage): The pixels of the image.
+        """
+        preview = image.preview_ensure() if bpy.app.version[0] >= 3 else image.preview
+
+        for size, size_attr, pixels_attr in ((preview_image_size, "image_size", "image_pixels_float"),
+                                             (preview_icon_size, "icon_size", "icon_pixels_float")):
+            thumbnail = nPng.crop(decoded, 0, 0, decoded.width, decoded.height, size)
+            setattr(preview, size_attr, (thumbnail.width, thumbnail.height))
+            getattr(preview, pixels_attr).foreach_set(thumbnail.pixels)
+
+        image[preview_icon_tag] = True
+
+    @staticmethod
+    def get_image_pixels(image):
+        """Reads the pixels of a Blender image, which decodes it if it hasn't been already."""
+        width, height = image.size
+        pixels = np.empty(width * height * 4, dtype=np.float32)
+        image.pixels.foreach_get(pixels)
+
+        return nPng.PngImage(width, height, pixels)
+
+    @staticmethod
+    def try_decode_png(png):
+        """Decodes png data, returning None if it can't be decoded so the png can be packed as is instead.
+
+        Pngs using the average or paeth filter are packed as is too, Blender decodes those far faster than python and
+        without holding the GIL. They're rejected once their first such row is inflated, so they cost next to nothing
+        here. decode_previews decodes them on worker processes instead once there are enough of them.
+        """
+        try:
+            return nPng.decode(png, allow_slow_filters=False)
+        except (nPng.PngError, zlib.error, ValueError):
+            return None
+
+    @staticmethod
+    def load_decoded(png, cache):
+        """Returns the decoded png from the image cache, decoding and caching it on a miss.
+
+        Args:
+            png (bytes): The png data to decode.
+            cache (ImageCache): The image cache to use, or None to always decode.
+
+        Returns:
+            PngImage: The decoded png, or None if it can't be decoded.
+        """
+        if cache is None:
+            return ImportRectData.try_decode_png(png)
+
+        key = hashlib.sha256(png).hexdigest()
+
+        decoded = cache.get(key)
+        if decoded is None:
+            decoded = ImportRectData.try_decode_png(png)
+            if decoded is not None:
+                cache.put(key, decoded)
+
+        return decoded
+
+    @staticmethod
+    def decode_previews(previews, worker_count, cache=None):
+        """Decodes preview pngs, serving them from the image cache where possible.
+
+        The ones that aren't cached are decoded on worker processes with every png filter, or on a thread pool with
+        try_decode_png if there are only a few of them or the processes can't be started.
+
+        Args:
+            previews (list): The png data of each rect preview.
+            worker_count (int): The number of decoding processes or threads, 0 uses one per cpu core.
+            cache (ImageCache): The image cache to use, or None to always decode.
+
+        Returns:
+            list: The decoded PngImage of each preview in rect order, None where a preview couldn't be decoded.
+        """
+
+        if worker_count < 1:
+            worker_count = os.cpu_count() or 1
+
+        if cache is not None:
+            keys = [hashlib.sha256(p).hexdigest() for p in previews]
+            decoded = [cache.get(k) for k in keys]
+        else:
+            keys = None
+            decoded = [None] * len(previews)
+
+        misses = [i for i, d in enumerate(decoded) if d is None]
+
+        if worker_count > 1 and len(misses) >= nBatch.min_process_pngs:
+            results = nBatch.decode_pngs_on_processes([bytes(previews[i]) for i in misses], worker_count)
+
+            if results is not None:
+                for i, result in zip(misses, results):
+                    if result is None:
+                        continue
+
+                    decoded[i] = nPng.PngImage(result.width, result.height, result.pixels.astype(np.float32) / 255.0)
+                    if cache is not None:
+                        cache.put(keys[i], decoded[i])
+
+                return decoded
+
+        def load(i):
+            image = ImportRectData.try_decode_png(previews[i])
+            if image is not None and cache is not None:
+                cache.put(keys[i], image)
+
+            return image
+
+        if worker_count == 1 or len(misses) < 2:
+            loaded = [load(i) for i in misses]
+        else:
+            # map hands results back in submission order, so rect N always gets preview N
+            with ThreadPoolExecutor(max_workers=worker_count) as pool:
+                loaded = list(pool.map(load, misses))
+
+        for i, image in zip(misses, loaded):
+            decoded[i] = image
+
+        return decoded
 
     @staticmethod
     def add_collection(n, file_path):
@@ -456,15 +1049,18 @@ class ImportRectData(bpy.types.Operator, ImportHelper):
 
         collection_list = bpy.context.scene.nuv_uvSets
 
-        for i in range(0, len(collection_list)):
-            collection = collection_list[i]
-            if collection.name == n:
-                collection.relative_path = file_path
-                return collection
+        collection = collection_list.get(n)
+        if collection is not None:
+            collection.relative_path = file_path
 
-        new_set = bpy.context.scene.nuv_uvSets.add()
+            # importing into a linked collection makes it local again
+            collection.library_scene = None
+            return collection
+
+        new_set = collection_list.add()
         new_set.name = n
         new_set.relative_path = file_path
+        new_set.storage_mode = bpy.context.scene.nuv_settings.import_storage_mode
 
         return new_set
 
@@ -482,41 +1078,6 @@ class ImportRectData(bpy.types.Operator, ImportHelper):
             if collection.name == n:
                 collection.clear()
 
-    @staticmethod
-    def rect_verts_compare(a, verts):
-        """Compares a rects vertices to the provided vertex array to determine if they are the same.
-
-        Args:
-            a (NeoTileRect): The rect to compare the array to.
-            verts (array): The array of vertices to use in the comparison.
-
-        Returns:
-            boolean: Whether the rect and vertex array succesfully compare.
-        """
-
-        return (a.topLeftX == verts[0][0] and a.topLeftY == verts[0][1]
-                and a.topRightX == verts[1][0] and a.topRightY == verts[1][1]
-                and a.bottomLeftX == verts[2][0] and a.bottomLeftY == verts[2][1]
-                and a.bottomRightX == verts[3][0] and a.bottomRightY == verts[3][1])
-
-    @staticmethod
-    def add_rect_to_collection(verts, img_name, c):
-        """Adds a rect to a given collection
-
-        Args:
-            verts (array): The array of vertices that make up the rect.
-            img_name (str): The name of the image to assign as the rect preview.
-            c (NeoTileRectCollection): The collection to add the rect to.
-        """
-
-        for t in c.items:
-            if ImportRectData.rect_verts_compare(t, verts):
-                ImportRectData.setup_rect(verts, img_name, t)
-                return
-
-        new_rect = c.items.add()
-        ImportRectData.setup_rect(verts, img_name, new_rect)
-
     @staticmethod
     def setup_rect(verts, img_name, t):
         """Configures a rect.
@@ -554,125 +1115,859 @@ class ImportRectData(bpy.types.Operator, ImportHelper):
                 [bottom_left_x, bottom_left_y]]
 
     @staticmethod
-    def import_file(filepath):
+    def get_preview_name(img_name, preview_hash):
+        """Returns the name of the shared preview image for previews with the given content hash, see
+        nProject.preview_image_name."""
+        return nProject.preview_image_name(img_name, preview_hash)
+
+    @staticmethod
+    def import_file(filepath, prepared=None):
+        """Imports a project file, updating the collection of the same name if it already exists.
+
+        Args:
+            filepath (str): The path of the project file.
+            prepared (PreparedProject): The project already parsed by nBatch.prepare_project, if it was.
+
+        Returns:
+            tuple: The operator report and the ImportSummary of the changes made.
+        """
+        return ImportRectData.run_steps(ImportRectData.import_file_steps(filepath, prepared))
+
+    @staticmethod
+    def import_file_steps(filepath, prepared=None):
+        """Imports a project file one step at a time, see import_steps. Returns the same as import_file."""
         try:
             relpath = os.path.relpath(filepath)
         except:
             relpath = filepath
 
-        with open(filepath, "rb") as f:
-            byte_order = 'little'
+        # skip reading the project entirely if the sidecar says it hasn't changed since the last import
+        collection = bpy.context.scene.nuv_uvSets.get(Path(filepath).stem)
+        sidecar = read_sidecar(filepath, header_only=True)
 
-            file_len = os.path.getsize(filepath)
-            loadedcontent = []
+        if collection is not None and sidecar is not None and ImportRectData.is_up_to_date(collection, sidecar):
+            collection.relative_path = relpath
 
-            # read header
-            id_len = int.from_bytes(f.read(1), byteorder=byte_order, signed=False)
-            id_name = f.read(id_len).decode("utf-8")
+            summary = ImportSummary()
+            summary.unchanged = len(collection.items)
+            summary.skipped_chunks = [c[0] for c in sidecar.chunks]
+            return {'FINISHED'}, summary
 
-            if id_name != "NEOPROJ":
-                return {'CANCELLED'}
+        try:
+            summary = yield from ImportRectData.import_steps(filepath, relpath, prepared)
+        except nProject.ProjectFileError as e:
+            print("Couldn't import \"" + filepath + "\": " + str(e))
+            return {'CANCELLED'}, ImportSummary()
 
-            # version
-            version = int.from_bytes(f.read(4), byteorder=byte_order, signed=False)
+        # previews of rects that were removed or changed are left behind
+        summary.purged, _ = purge_unused_images()
 
-            # load data
-            while f.tell() < file_len:
-                new_content = ProjectFileContent(f)
-                loadedcontent.append(new_content)
+        return {'FINISHED'}, summary
 
-                curr_pos = f.tell()
-                f.seek(curr_pos + new_content.dataLen)
+    @staticmethod
+    def run_steps(steps):
+        """Runs import steps to completion on the calling thread and returns their result."""
+        value = None
+        error = None
+
+        while True:
+            try:
+                step = steps.send(value) if error is None else steps.throw(error)
+            except StopIteration as e:
+                return e.value
+
+            value = None
+            error = None
+
+            # work meant for a worker thread just runs here
+            if callable(step):
+                try:
+                    value = step()
+                except Exception as e:
+                    error = e
 
-            # process data
-            for c in loadedcontent:
-                f.seek(c.dataAddress)
+    @staticmethod
+    def is_up_to_date(collection, sidecar):
+        """Returns whether a collection holds everything from the project described by a valid sidecar."""
+        if len(collection.chunks) != len(sidecar.chunks):
+            return False
 
-                if c.name == "atlas":
-                    # not needed for blender loading
-                    tile_width = int.from_bytes(f.read(4), byteorder=byte_order, signed=True)
-                    tile_height = int.from_bytes(f.read(4), byteorder=byte_order, signed=True)
+        for name, offset, _, content_hash in sidecar.chunks:
+            chunk = collection.get_chunk(name)
+            if not content_hash or chunk is None or chunk.contentHash != content_hash or chunk.offset != offset:
+                return False
 
-                    png_len = int.from_bytes(f.read(4), byteorder=byte_order, signed=True)
-                    png_bytes = f.read(png_len)
+            if name == "atlas" and bpy.data.images.get("Atlas_" + collection.name) is None:
+                return False
 
-                    # save atlas to a temp location and then reload it
-                    img_name = Path(filepath).stem
-                    img_path = os.path.join(os.path.dirname(filepath), img_name + "_atlas.png")
+            if name == "uvs" and len(collection.items) == 0:
+                return False
 
-                    with open(img_path, mode="wb") as atlasF:
-                        atlasF.write(png_bytes)
+        settings = bpy.context.scene.nuv_settings
+        directory = get_external_image_directory() if collection.storage_mode == "EXTERNAL" else None
+        preview_source = ImportRectData.get_preview_source(settings, sidecar.get_chunk_hash("atlas"))
 
-                    ImportRectData.add_image(img_path, "Atlas_" + img_name)
+        return (collection.preview_source == preview_source and
+                collection.image_storage == ImportRectData.get_image_storage(directory))
 
-                    # we're done with the file, remove it
-                    if os.path.exists(img_path): os.remove(img_path)
-                elif c.name == "uvs":
-                    rect_count = int.from_bytes(f.read(4), byteorder=byte_order, signed=True)
+    @staticmethod
+    def import_steps(filepath, relpath, prepared=None):
+        """Imports the chunks of a project file one step at a time, so the import can run without blocking Blender.
 
-                    # clear the collection if it already exists
-                    img_name = Path(filepath).stem
-                    ImportRectData.clear_collection(img_name)
+        The generator yields either a function, which should be called on a worker thread and its result sent back,
+        or the progress of the import from 0 to 1. Reading, hashing and decoding happen in those functions and
+        everything touching Blender happens between them. Existing images and the collection are only changed once
+        it yields commit_step, closing the generator before then leaves them as they were and removes the images that
+        were added. It mustn't be closed after.
 
-                    for i in range(0, rect_count):
-                        # uv vertex positions
-                        top_left_x = struct.unpack('f', f.read(4))[0]
-                        top_left_y = struct.unpack('f', f.read(4))[0]
+        Args:
+            filepath (str): The path of the project file.
+            relpath (str): The path to store on the collection.
+            prepared (PreparedProject): The project already parsed by nBatch.prepare_project, if it was. It's only
+                used while the file hasn't changed since.
 
-                        top_right_x = struct.unpack('f', f.read(4))[0]
-                        top_right_y = struct.unpack('f', f.read(4))[0]
+        Returns:
+            ImportSummary: The changes that were made to the collection.
+        """
 
-                        bottom_right_x = struct.unpack('f', f.read(4))[0]
-                        bottom_right_y = struct.unpack('f', f.read(4))[0]
+        img_name = Path(filepath).stem
+        settings = bpy.context.scene.nuv_settings
+        summary = ImportSummary()
+        created = []
+        overwrites = []
+        committed = False
+        plan = None
+        uvs = None
+
+        # a valid sidecar already has the chunk hashes and rect table, so the file doesn't need hashing or walking
+        if prepared is not None and prepared.sidecar.is_valid_for(filepath):
+            sidecar = prepared.sidecar
+            content_hashes = prepared.content_hashes
+        else:
+            sidecar = read_sidecar(filepath)
+            content_hashes = None
+
+        # everything needed from the collection is read up front, it can change or move while we're yielding
+        collection = bpy.context.scene.nuv_uvSets.get(img_name)
+        if collection is not None:
+            storage_mode = collection.storage_mode
+            old_source = collection.preview_source
+            old_storage = collection.image_storage
+            old_chunks = {c.name: (c.contentHash, c.offset) for c in collection.chunks}
+            old_count = len(collection.items)
+        else:
+            storage_mode = settings.import_storage_mode
+            old_source = ""
+            old_storage = ""
+            old_chunks = {}
+            old_count = 0
+
+        directory = get_external_image_directory() if storage_mode == "EXTERNAL" else None
+        storage = ImportRectData.get_image_storage(directory)
 
-                        bottom_left_x = struct.unpack('f', f.read(4))[0]
-                        bottom_left_y = struct.unpack('f', f.read(4))[0]
+        try:
+            with nProject.ProjectReader(filepath) as reader:
+                if reader.size > max_project_bytes:
+                    raise nProject.ProjectFileError("The project file is " + str(round(reader.size / 2 ** 30, 2)) +
+                                                    " GiB, only files up to 2 GiB can be imported.")
+
+                hashes = yield functools.partial(ImportRectData.hash_chunks, reader, sidecar)
+                yield 0.1
+
+                preview_source = ImportRectData.get_preview_source(settings, hashes.get("atlas", ""))
+                atlas_chunk = reader.get_chunk("atlas")
+                uvs_chunk = reader.get_chunk("uvs")
+                atlas_name = "Atlas_" + img_name
+
+                def is_unchanged(name):
+                    return (name in old_chunks and hashes[name] == old_chunks[name][0] and
+                            old_source == preview_source and old_storage == storage)
+
+                write_atlas = atlas_chunk is not None and not (is_unchanged("atlas") and
+                                                               bpy.data.images.get(atlas_name) is not None)
+                import_uvs = uvs_chunk is not None and not (is_unchanged("uvs") and old_count > 0)
+
+                atlas_png = None
+                if write_atlas or (import_uvs and preview_source.startswith("ATLAS")):
+                    atlas_png = (yield functools.partial(reader.read_atlas, atlas_chunk)).png
+
+                if import_uvs:
+                    atlas = None
+                    if preview_source.startswith("ATLAS"):
+                        atlas = yield functools.partial(ImportRectData.decode_atlas, atlas_png)
+
+                        # let blender decode anything we can't, or can't quickly
+                        if atlas is None:
+                            atlas = ImportRectData.read_blender_pixels(atlas_png, as_float=False)
+
+                        if atlas is None:
+                            preview_source = ImportRectData.get_preview_source(settings, "")
+
+                    if sidecar is not None:
+                        uvs = yield functools.partial(reader.read_uvs_from_sidecar, sidecar)
+                    else:
+                        uvs = yield functools.partial(reader.read_uvs, uvs_chunk)
+                    yield 0.2
+
+                    refresh = old_source != preview_source or old_storage != storage
+                    plan = yield from ImportRectData.plan_rects(img_name, uvs, settings, atlas, refresh,
+                                                                content_hashes)
+
+                    # previews are named by their content, so images that already exist are shared as they are.
+                    # they only exist here when they're written again, which waits for the commit
+                    for n, (name, png, decoded) in enumerate(plan.images):
+                        if bpy.data.images.get(name) is None:
+                            created.append(name)
+                            ImportRectData.write_preview(png, name, decoded, directory)
+                        else:
+                            overwrites.append((name, png, decoded))
+
+                        yield 0.6 + 0.2 * (n + 1) / len(plan.images)
+
+                # everything from here on changes the collection and can't be cancelled
+                collection = bpy.context.scene.nuv_uvSets.get(img_name)
+                expected_count = plan.current_count if plan is not None else old_count
+
+                if (len(collection.items) if collection is not None else 0) != expected_count:
+                    raise nProject.ProjectFileError("The tile map changed while it was being imported.")
+
+                committed = True
+                yield commit_step
+
+                for n, (name, png, decoded) in enumerate(overwrites):
+                    ImportRectData.write_preview(png, name, decoded, directory)
+                    yield 0.8 + 0.1 * (n + 1) / len(overwrites)
+
+                collection = ImportRectData.add_collection(img_name, relpath)
+                collection.project_version = reader.version
+                collection.image_storage = storage
+
+                if write_atlas:
+                    ImportRectData.add_image(atlas_png, atlas_name, directory=directory)
+                    collection.bump_generation()
+
+                if plan is not None:
+                    yield from ImportRectData.apply_rects(img_name, uvs, plan, preview_source)
+                    summary = plan.summary
+                elif uvs_chunk is not None:
+                    summary.unchanged = len(collection.items)
+
+                    # an unchanged chunk can still move if a chunk before it changed size
+                    shift = uvs_chunk.dataAddress - old_chunks["uvs"][1]
+                    if shift and not uvs_chunk.compressed:
+                        for start in range(0, summary.unchanged, commit_slice_rects):
+                            for rect in collection.items[start:start + commit_slice_rects]:
+                                rect.previewOffset += shift
+
+                            yield 0.9 + 0.1 * start / summary.unchanged
+                            collection = ImportRectData.get_committing_collection(img_name, summary.unchanged)
+
+                        collection.bump_generation()
+
+                # the collection can't be held on to across the yields above
+                collection = bpy.context.scene.nuv_uvSets.get(img_name)
+
+                summary.skipped_chunks = [c.name for c in reader.chunks if
+                                          (c.name == "atlas" and not write_atlas) or (c.name == "uvs" and not import_uvs)]
 
-                        # preview texture data
-                        png_len = int.from_bytes(f.read(4), byteorder=byte_order, signed=True)
-                        png_bytes = f.read(png_len)
+                collection.set_chunk_index(reader.chunks, hashes)
 
-                        img_path = os.path.join(os.path.dirname(filepath), img_name + "_preview.png")
+                if sidecar is None:
+                    if uvs is None and uvs_chunk is not None:
+                        uvs = reader.read_uvs(uvs_chunk)
 
-                        with open(img_path, mode="wb") as previewF:
-                            previewF.write(png_bytes)
+                    write_sidecar(filepath, nProject.ProjectSidecar.from_project(filepath, reader.version,
+                                                                                 reader.chunks, hashes, uvs))
+        except BaseException:
+            # cancelled or failed, take back the images nothing references yet
+            if not committed:
+                for name in created:
+                    image = bpy.data.images.get(name)
+                    if image is not None:
+                        bpy.data.images.remove(image)
 
-                        preview_name = ".Atlas_" + img_name + "_Preview" + str(i)
-                        ImportRectData.add_image(img_path, preview_name)
+            raise
 
-                        # we're done with the file, remove it
-                        if os.path.exists(img_path): os.remove(img_path)
+        return summary
 
-                        # create collection item
-                        verts = ImportRectData.to_verts(top_left_x, top_left_y,
-                                                        top_right_x, top_right_y,
-                                                        bottom_right_x, bottom_right_y,
-                                                        bottom_left_x, bottom_left_y)
+    @staticmethod
+    def plan_rects(img_name, uvs, settings, atlas, refresh, content_hashes=None):
+        """Works out how to update the rects of a collection to match a uvs chunk, without changing it.
 
-                        collection = ImportRectData.add_collection(img_name, relpath)
-                        ImportRectData.add_rect_to_collection(verts, preview_name, collection)
+        Rects are matched by their quantized vertices. Only rects that are new or whose vertices or preview changed
+        are written, and only their previews are decoded. Rects with identical previews share a single image. With
+        lazy previews nothing is decoded, rects only record where their preview is in the project file. Yields
+        the same as import_steps.
 
-                        collection.update_pattern_indicies()
-        return {'FINISHED'}
+        Args:
+            img_name (str): The name of the project, which is also the name of the collection.
+            uvs (UvChunk): The uvs chunk to update the collection from.
+            settings (NeoUvUiSettings): The scene settings to import with.
+            atlas (PngImage): The decoded atlas to crop previews from instead of using the preview pngs.
+            refresh (bool): Whether to write every preview again, because what they're made from or how they're
+                stored changed since the collection was last imported.
+            content_hashes (list): The content hash of each rect in file order if they're already known.
 
-    def execute(self, context):
-        report = self.import_file(self.properties.filepath)
+        Returns:
+            RectPlan: The rects and preview images to write.
+        """
+
+        plan = RectPlan()
+        summary = plan.summary
+
+        # snapshot the rects we already have in one go, the first of any duplicates wins
+        current = []
+        existing = {}
+        collection = bpy.context.scene.nuv_uvSets.get(img_name)
+
+        for rect in collection.items if collection is not None else []:
+            key = rect_key(rect)
+            current.append(key)
+
+            if key not in existing:
+                existing[key] = (rect.previewName, rect.contentHash)
+
+        plan.current_count = len(current)
+
+        incoming, content_hashes = yield functools.partial(ImportRectData.hash_rects, uvs, content_hashes)
+        yield 0.3
+
+        summary.removed = len(current) - sum(1 for key in existing if key in incoming)
+
+        # new rects only appended to the end can be added in place, anything else rebuilds the collection in file
+        # order. both are linear, unlike moving rects around one at a time.
+        plan.rebuilt = current != list(incoming)[:len(current)]
+
+        # work out which rects need writing, previews in a compressed chunk can't be read lazily
+        lazy = settings.import_lazy_previews and atlas is None and not uvs.compressed
+        changed = []
+
+        for t, (key, i) in enumerate(incoming.items()):
+            if t % 1024 == 0:
+                yield 0.3 + 0.1 * t / len(incoming)
+
+            content_hash = content_hashes[i]
+            old = existing.get(key)
+
+            if old is None:
+                summary.added += 1
+            elif old[1] != content_hash:
+                summary.modified += 1
+            elif lazy or bpy.data.images.get(old[0]) is not None:
+                summary.unchanged += 1
+
+                if not refresh:
+                    plan.rows.append([i, old[0], content_hash, False])
+                    continue
+            else:
+                # the preview image went missing, write it again
+                summary.modified += 1
+
+            plan.rows.append([i, "", content_hash, True])
+            changed.append(t)
+
+        # previews are named by their content, so rects with identical previews share one image and an image that
+        # already exists is already up to date
+        verts = [uvs.verts[plan.rows[t][0]] for t in changed]
+
+        if atlas is not None:
+            decoded, preview_hashes = yield functools.partial(ImportRectData.crop_previews, atlas, verts,
+                                                              settings.preview_max_size)
+        else:
+            decoded = None
+            all_hashes = yield functools.partial(uvs.hash_previews)
+            preview_hashes = [all_hashes[plan.rows[t][0]].hex() for t in changed]
+        yield 0.5
+
+        to_write = {}
+        for n, (t, preview_hash) in enumerate(zip(changed, preview_hashes)):
+            name = ImportRectData.get_preview_name(img_name, preview_hash)
+            plan.rows[t][1] = name
+
+            if name not in to_write and (refresh or bpy.data.images.get(name) is None):
+                to_write[name] = n
+
+        # lazy previews are created when they're first drawn, the ones that already were are written again so they
+        # don't keep the old source or storage
+        if lazy:
+            to_write = {name: n for name, n in to_write.items() if bpy.data.images.get(name) is not None}
+
+        # decode only what changed
+        pngs = [uvs.previews[plan.rows[changed[n]][0]] for n in to_write.values()]
+
+        if decoded is not None:
+            decoded = [decoded[n] for n in to_write.values()]
+            pngs = [None] * len(to_write)
+        elif settings.import_decode_previews:
+            decoded = yield functools.partial(ImportRectData.decode_previews, pngs, settings.import_worker_count,
+                                              get_image_cache(settings))
+        else:
+            decoded = [None] * len(to_write)
+        yield 0.6
+
+        plan.images = list(zip(to_write, pngs, decoded))
+
+        summary.rects = len(plan.rows)
+        summary.previews = len({r[1] for r in plan.rows})
+
+        return plan
+
+    @staticmethod
+    def write_preview(png, name, decoded, directory):
+        """Adds or replaces a preview image from a plan, see add_image."""
+        image = ImportRectData.add_image(png, name, decoded, directory=directory)
+
+        # previews packed as pngs get their icon the first time they're drawn instead
+        if decoded is not None:
+            ImportRectData.set_preview_icon(image, decoded)
+
+    @staticmethod
+    def get_committing_collection(img_name, count):
+        """Returns the collection an import is writing to after it yielded, which Blender may have changed or replaced
+        in the meantime, for example by undo.
+
+        Raises:
+            ProjectFileError: The collection is gone or doesn't have the rects written so far anymore.
+        """
+        collection = bpy.context.scene.nuv_uvSets.get(img_name)
+
+        if collection is None or len(collection.items) != count:
+            raise nProject.ProjectFileError("The tile map changed while it was being imported, reload it.")
+
+        return collection
+
+    @staticmethod
+    def apply_rects(img_name, uvs, plan, preview_source):
+        """Writes the rects of a plan to a collection, leaving it in file order. Yields its progress every
+        commit_slice_rects rects like import_steps.
+
+        Args:
+            img_name (str): The name of the collection to update.
+            uvs (UvChunk): The uvs chunk the plan was made from.
+            plan (RectPlan): The plan from plan_rects.
+            preview_source (str): What the previews are made from, from get_preview_source.
+        """
+        collection = ImportRectData.get_committing_collection(img_name, plan.current_count)
+        count = len(plan.rows)
+
+        if plan.rebuilt:
+            collection.items.clear()
+
+        for n in range(len(collection.items), count):
+            collection.items.add()
+
+            if n % commit_slice_rects == commit_slice_rects - 1:
+                yield 0.9
+                collection = ImportRectData.get_committing_collection(img_name, n + 1)
+
+        collection = ImportRectData.get_committing_collection(img_name, count)
+
+        verts = uvs.verts.tolist()
+        preview_offsets = uvs.preview_offsets.tolist()
+        preview_lengths = uvs.preview_lengths.tolist()
+
+        # previews in a compressed chunk can't be read from the file on their own
+        if uvs.compressed:
+            preview_offsets = preview_lengths = [0] * len(verts)
+
+        for start in range(0, count, commit_slice_rects):
+            rows = plan.rows[start:start + commit_slice_rects]
+
+            for rect, (i, name, content_hash, write) in zip(collection.items[start:start + len(rows)], rows):
+                # previews move around the file whenever anything before them changes
+                if rect.previewOffset != preview_offsets[i]: rect.previewOffset = preview_offsets[i]
+                if rect.previewLength != preview_lengths[i]: rect.previewLength = preview_lengths[i]
+
+                if write or plan.rebuilt:
+                    ImportRectData.setup_rect(ImportRectData.to_verts(*verts[i]), name, rect)
+                    rect.contentHash = content_hash
+
+            yield 0.9 + 0.1 * (start + len(rows)) / count
+            collection = ImportRectData.get_committing_collection(img_name, count)
+
+        collection.preview_source = preview_source
+        collection.bump_generation()
+
+        # rects can move without any being added, removed or modified, resolving entries by id is cheap anyway
+        collection.update_pattern_indicies()
+
+    @staticmethod
+    def hash_chunks(reader, sidecar):
+        """Returns the content hash of every chunk by name, taking them from the sidecar where it has them."""
+        hashes = {}
+        for c in reader.chunks:
+            content_hash = sidecar.get_chunk_hash(c.name) if sidecar is not None else ""
+            hashes[c.name] = content_hash or reader.hash_chunk(c)
+
+        return hashes
+
+    @staticmethod
+    def hash_rects(uvs, content_hashes=None):
+        """Returns the rect indices of a uvs chunk by rect key in file order, and the content hash of each of them by
+        index. A rect repeating an earlier rects vertices replaces it. Content hashes that are already known, as a
+        list in file order, aren't computed again."""
+        incoming = {}
+        for i, verts in enumerate(uvs.verts.tolist()):
+            incoming[nProject.rect_key(verts)] = i
+
+        if content_hashes is None:
+            content_hashes = {i: nProject.hash_rect(uvs.verts[i], uvs.previews[i]) for i in incoming.values()}
+
+        return incoming, content_hashes
+
+    @staticmethod
+    def get_preview_source(settings, atlas_hash):
+        """Returns what rect previews are made from with the current settings, changing it writes every image again.
+
+        Args:
+            settings (NeoUvUiSettings): The scene settings to import with.
+            atlas_hash (str): The content hash of the atlas chunk, or an empty string if there isn't one.
+        """
+        if settings.import_preview_source == "ATLAS" and atlas_hash:
+            return "ATLAS " + atlas_hash + " " + str(settings.preview_max_size)
+
+        return "PNG"
+
+    @staticmethod
+    def get_image_storage(directory):
+        """Returns how images are stored when they're written to a directory from get_storage_directory, changing it
+        writes every image again.
+
+        Args:
+            directory (str): The folder images are stored in, or None if they're packed.
+        """
+        return "PACKED" if directory is None else "EXTERNAL"
+
+    @staticmethod
+    def decode_atlas(png):
+        """Decodes the atlas png for cropping previews from, returning None if it can't be decoded or uses the
+        average or paeth filter, which Blender decodes much faster."""
+        try:
+            return nPng.decode(png, as_float=False, allow_slow_filters=False)
+        except nPng.SlowFilterError:
+            return None
+        except (nPng.PngError, zlib.error, ValueError) as e:
+            print("Couldn't decode the atlas, falling back to Blender: " + str(e))
+            return None
+
+    @staticmethod
+    def read_blender_pixels(png, as_float=True):
+        """Decodes png data through a temporary Blender image, returning None if Blender can't decode it either.
+
+        Args:
+            png (bytes): The png data to decode.
+            as_float (bool): Whether to keep the float pixels Blender reads, or convert them to uint8 like
+                nPng.decode does without converting to float, which takes a quarter of the memory.
+        """
+        data = bytes(png)
+        image = bpy.data.images.new(".nuv_decode", 1, 1, alpha=True)
+
+        try:
+            image.pack(data=data, data_len=len(data))
+            image.source = "FILE"
+            image.reload()
+
+            if image.size[0] == 0:
+                return None
+
+            decoded = ImportRectData.get_image_pixels(image)
+
+            if not as_float:
+                pixels = decoded.pixels
+                np.multiply(pixels, 255.0, out=pixels)
+                pixels += 0.5
+                np.clip(pixels, 0.0, 255.0, out=pixels)
+                decoded.pixels = pixels.astype(np.uint8)
+
+            return decoded
+        finally:
+            bpy.data.images.remove(image)
+
+    @staticmethod
+    def crop_preview(atlas, verts, max_size):
+        """Crops the preview of a rect out of the atlas.
+
+        Args:
+            atlas (PngImage): The atlas.
+            verts (numpy.ndarray): The 8 vertex coordinates of the rect in file order, from -1 to 1.
+            max_size (int): The maximum width and height of the preview.
+
+        Returns:
+            PngImage: The preview.
+        """
+        u = (verts[0::2] + 1.0) * 0.5 * atlas.width
+        v = (verts[1::2] + 1.0) * 0.5 * atlas.height
+
+        return nPng.crop(atlas, int(math.floor(u.min())), int(math.floor(v.min())),
+                         int(math.ceil(u.max())), int(math.ceil(v.max())), max_size)
+
+    @staticmethod
+    def crop_previews(atlas, verts, max_size):
+        """Crops the previews of rects out of the atlas, returning them and the sha256 hex digest of their pixels."""
+        decoded = [ImportRectData.crop_preview(atlas, v, max_size) for v in verts]
+        return decoded, [hashlib.sha256(d.pixels.tobytes()).hexdigest() for d in decoded]
+
+    def report_import(self, report, summary):
         for r in report:
             if r == "CANCELLED":
                 self.report({"ERROR"}, "Not a valid tile map project file.")
+            else:
+                self.report({"INFO"}, "Imported tile map: " + str(summary))
+
+    def execute(self, context):
+        # without a window there's nothing to keep responsive
+        if bpy.app.background or context.window is None:
+            report, summary = self.import_file(self.properties.filepath)
+            self.report_import(report, summary)
+            return report
+
+        self._task = ImportTask(self.import_file_steps(self.properties.filepath))
+        self._task.start()
+
+        wm = context.window_manager
+        self._timer = wm.event_timer_add(0.1, window=context.window)
+        wm.modal_handler_add(self)
+        wm.progress_begin(0, 100)
+        context.workspace.status_text_set("Importing tile map, press Esc to cancel.")
+
+        return {'RUNNING_MODAL'}
 
+    def modal(self, context, event):
+        task = self._task
+
+        if event.type == "ESC" and event.value == "PRESS":
+            task.cancel()
+            return {'RUNNING_MODAL'}
+
+        if not task.done:
+            context.window_manager.progress_update(int(task.progress * 100))
+            return {'PASS_THROUGH'}
+
+        wm = context.window_manager
+        wm.event_timer_remove(self._timer)
+        wm.progress_end()
+        context.workspace.status_text_set(None)
+
+        if task.cancelled:
+            self.report({"WARNING"}, "Import cancelled, the tile map was left unchanged.")
+            return {'CANCELLED'}
+
+        if task.error is not None:
+            self.report({"ERROR"}, "Couldn't import the tile map: " + str(task.error))
+            return {'CANCELLED'}
+
+        report, summary = task.result
+        self.report_import(report, summary)
         return report
 
 
-class ProjectFileContent:
-    """Contains data read from a neognosisi project file.
+class ImportRectDirectory(bpy.types.Operator, ImportHelper):
+    """Imports every project file in a folder, parsing them in parallel on worker processes first."""
+
+    bl_idname = "import_tileset.tmprj_folder"
+    bl_label = "Import Neo Tile Set Folder"
+    bl_description = "Imports every tile map project in a folder, skipping projects that haven't changed since they were last imported."
+
+    directory: StringProperty(subtype="DIR_PATH")
+
+    filter_glob: bpy.props.StringProperty(
+        default="*.tmprj",
+        options={'HIDDEN'}
+    )
+
+    def execute(self, context):
+        try:
+            names = os.listdir(self.directory)
+        except OSError as e:
+            self.report({"ERROR"}, "Couldn't read the folder: " + str(e))
+            return {'CANCELLED'}
+
+        filepaths = sorted(os.path.join(self.directory, n) for n in names
+                           if n.lower().endswith(ImportRectData.filename_ext))
+
+        if not filepaths:
+            self.report({"ERROR"}, "The folder doesn't contain any tile map project files.")
+            return {'CANCELLED'}
+
+        settings = context.scene.nuv_settings
+        cache = get_image_cache(settings) if settings.import_decode_previews else None
+
+        # projects whose sidecar says their collection is up to date aren't read at all
+        jobs = []
+        for filepath in filepaths:
+            collection = context.scene.nuv_uvSets.get(Path(filepath).stem)
+            sidecar = read_sidecar(filepath, header_only=True)
+
+            if collection is None or sidecar is None or not ImportRectData.is_up_to_date(collection, sidecar):
+                jobs.append((filepath, get_sidecar_path(filepath), cache.directory if cache is not None else None,
+                             cache.max_disk_bytes if cache is not None else 0))
+
+        results = nBatch.prepare_projects(jobs, settings.import_worker_count)
+
+        # the workers wrote new sidecars behind the header cache's back
+        prepared = {}
+        failed = set()
+        for (filepath, sidecar_path, _, _), result in zip(jobs, results):
+            sidecar_headers.pop(sidecar_path, None)
+
+            if result.error is not None:
+                print("Couldn't import \"" + filepath + "\": " + result.error)
+                failed.add(filepath)
+            else:
+                prepared[filepath] = result
+
+        # merge everything in one pass, prepared projects are only diffed against their collection and write their
+        # images from the image cache, unchanged ones take the fast path
+        imported = 0
+        skipped = 0
+        for filepath in filepaths:
+            if filepath in failed:
+                continue
+
+            if "FINISHED" not in ImportRectData.import_file(filepath, prepared.get(filepath))[0]:
+                failed.add(filepath)
+            elif filepath in prepared:
+                imported += 1
+            else:
+                skipped += 1
+
+        self.report({"INFO"}, "Imported " + str(imported) + " tile maps, skipped " + str(skipped) + " unchanged.")
+
+        if failed:
+            self.report({"WARNING"}, str(len(failed)) + " projects couldn't be imported, see the console for details.")
+
+        return {'FINISHED'}
+
+
+class RectPlan:
+    """The rects and preview images an import writes to a collection."""
+
+    def __init__(self):
+        self.summary = ImportSummary()
+
+        # the source index, preview name, content hash and whether it needs writing of each rect in file order
+        self.rows = []
+
+        # the name, png data and decoded pixels of each preview image to write
+        self.images = []
+
+        # whether the collection is rebuilt rather than appended to, and how many rects it had
+        self.rebuilt = False
+        self.current_count = 0
+
+
+class ImportTask:
+    """Runs import steps in the background. The functions handed out by the steps run on a worker thread and the
+    rest runs on the main thread in short slices from a timer, so Blender stays responsive.
     """
 
-    def __init__(self, f):
-        name_len = int.from_bytes(f.read(1), byteorder='little', signed=False)
-        self.name = f.read(name_len).decode('utf-8')
-        self.dataLen = int.from_bytes(f.read(8), byteorder='little', signed=True)
-        self.dataAddress = f.tell()
+    # the longest a slice on the main thread should take, in seconds
+    slice_time = 0.02
+
+    def __init__(self, steps):
+        self.steps = steps
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.cancelled = False
+        self.done = False
+
+        self._pool = ThreadPoolExecutor(max_workers=1)
+        self._future = None
+        self._cancel = False
+        self._committing = False
+
+    def start(self):
+        bpy.app.timers.register(self.step)
+
+    def cancel(self):
+        """Stops the import at the next step, once the worker thread is done with the file. It can't be stopped once
+        it started changing the collection."""
+        self._cancel = True
+
+    def step(self):
+        """Runs the steps for one slice, returning when the timer should call it again."""
+        start = time.perf_counter()
+        value = None
+        error = None
+
+        while True:
+            if self._future is not None:
+                if not self._future.done():
+                    return 0.01
+
+                try:
+                    value = self._future.result()
+                except Exception as e:
+                    error = e
+
+                self._future = None
+
+            if self._cancel and not self._committing:
+                self.cancelled = True
+                self.steps.close()
+                return self._finish()
+
+            try:
+                step = self.steps.send(value) if error is None else self.steps.throw(error)
+            except StopIteration as e:
+                self.result = e.value
+                return self._finish()
+            except Exception as e:
+                self.error = e
+                return self._finish()
+
+            value = None
+            error = None
+
+            if callable(step):
+                self._future = self._pool.submit(step)
+            elif step is commit_step:
+                self._committing = True
+            else:
+                self.progress = step
+
+                if time.perf_counter() - start > self.slice_time:
+                    return 0.0
+
+    def _finish(self):
+        self.done = True
+        self._pool.shutdown(wait=False)
+        return None
+
+
+class ImportSummary:
+    """Counts the rect changes made by an import."""
+
+    def __init__(self):
+        self.added = 0
+        self.removed = 0
+        self.modified = 0
+        self.unchanged = 0
+        self.skipped_chunks = []
+        self.rects = 0
+        self.previews = 0
+        self.purged = 0
+
+    def get_dedupe_rate(self):
+        """Returns the fraction of rects that share a preview image with another rect."""
+        return 1.0 - self.previews / self.rects if self.rects else 0.0
+
+    def __str__(self):
+        text = (str(self.added) + " added, " + str(self.removed) + " removed, " +
+                str(self.modified) + " modified, " + str(self.unchanged) + " unchanged")
+
+        if self.rects:
+            text += (", " + str(self.previews) + " preview images for " + str(self.rects) + " rects (" +
+                     str(round(self.get_dedupe_rate() * 100)) + "% deduplicated)")
+
+        if self.skipped_chunks:
+            text += ", skipped unchanged " + ", ".join(self.skipped_chunks)
+
+        if self.purged:
+            text += ", purged " + str(self.purged) + " unused images"
+
+        return text
 
 # endregion
 
@@ -681,11 +1976,15 @@ class ProjectFileContent:
 
 classes = (
     ImportRectData,
+    ImportRectDirectory,
     NeoTileRect,
     NeoTilePatternEntry,
     NeoTileRectPattern,
+    NeoTileChunk,
+    NeoTileImageRef,
     NeoTileRectCollection,
     NeoTileDeleteCollection,
+    NeoTilePurgeImages,
     NeoTileAddPattern,
     NeoTileDeletePattern,
     NeoTileMovePattern,
@@ -693,11 +1992,13 @@ classes = (
     NeoTileAddPatternRect,
     NeoTileSetPatternRect,
     NeoTileDeletePatternRect,
+    NeoTileClearImageCache,
 )
 
 
 def menu_import(self, context):
     self.layout.operator(ImportRectData.bl_idname, text="Neognosis Tile Set (.tmprj)")
+    self.layout.operator(ImportRectDirectory.bl_idname, text="Neognosis Tile Set Folder (.tmprj)")
 
 
 def register():
@@ -0,0 +1,215 @@
+# region Imports
+
+import os
+import struct
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# batch imports fill the cache from worker processes, where this module is imported as part of the worker package
+# instead of the addon package. tools import it on its own
+if __package__:
+    from . import nPng
+else:
+    import nPng
+
+# endregion
+
+# region Settings
+
+cache_magic = b"NTMC"
+cache_version = 1
+cache_extension = ".rgba"
+
+# magic, version, width, height
+cache_header = struct.Struct("<4sIII")
+
+memory_max_bytes = 64 * 1024 * 1024
+
+# endregion
+
+# region Cache
+
+
+class ImageCache:
+    """Caches decoded images by the sha256 of their png data.
+
+    Hits are served from an in process LRU first, then from a directory of RGBA8 buffers that is trimmed to a size
+    cap by evicting the least recently used files. The cache is safe to use from decoding threads.
+    """
+
+    def __init__(self, directory, max_disk_bytes, max_memory_bytes=memory_max_bytes):
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_bytes = max_memory_bytes
+        self.hits = 0
+        self.misses = 0
+
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = None
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns the cached PngImage for a key, or None if it isn't cached."""
+        with self._lock:
+            image = self._memory.get(key)
+            if image is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return image
+
+        image = self._read(key)
+
+        with self._lock:
+            if image is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._remember(key, image)
+
+        return image
+
+    def contains(self, key):
+        """Returns whether a key is cached, without reading it."""
+        with self._lock:
+            if key in self._memory:
+                return True
+
+        return os.path.exists(self._path(key))
+
+    def put(self, key, image):
+        """Caches a decoded PngImage under a key, writing it to disk and evicting old entries if needed."""
+        with self._lock:
+            self._remember(key, image)
+
+        self._write(key, image)
+
+    def configure(self, directory, max_disk_bytes):
+        """Points the cache at a new directory or size cap, keeping the in process entries."""
+        with self._lock:
+            if directory != self.directory:
+                self.directory = directory
+                self._disk_bytes = None
+
+            self.max_disk_bytes = max_disk_bytes
+
+    def clear(self):
+        """Removes every entry from memory and disk."""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+
+            for path, _, _ in self._list_files():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+            self._disk_bytes = 0
+
+    def _remember(self, key, image):
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return
+
+        self._memory[key] = image
+        self._memory_bytes += image.pixels.nbytes
+
+        while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+            _, old = self._memory.popitem(last=False)
+            self._memory_bytes -= old.pixels.nbytes
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + cache_extension)
+
+    def _read(self, key):
+        path = self._path(key)
+
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+
+        if len(data) < cache_header.size:
+            return None
+
+        magic, version, width, height = cache_header.unpack_from(data)
+        if magic != cache_magic or version != cache_version or len(data) != cache_header.size + width * height * 4:
+            return None
+
+        # mark as recently used for eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        rgba = np.frombuffer(data, dtype=np.uint8, offset=cache_header.size)
+        return nPng.PngImage(width, height, rgba.astype(np.float32) / 255.0)
+
+    def _write(self, key, image):
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+
+        rgba = np.round(np.clip(image.pixels, 0.0, 1.0) * 255.0).astype(np.uint8)
+        data = cache_header.pack(cache_magic, cache_version, image.width, image.height) + rgba.tobytes()
+
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            # write to a temp file first so other threads and processes never read a partial entry
+            temp_path = path + "." + str(os.getpid()) + "." + str(threading.get_ident()) + ".tmp"
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print("Couldn't write to the image cache: " + str(e))
+            return
+
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, size, _ in self._list_files())
+            else:
+                self._disk_bytes += len(data)
+
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict()
+
+    def _evict(self):
+        # trim to 90% of the cap so we're not evicting on every write
+        target = self.max_disk_bytes * 0.9
+
+        for path, size, _ in sorted(self._list_files(), key=lambda f: f[2]):
+            if self._disk_bytes <= target:
+                break
+
+            try:
+                os.remove(path)
+                self._disk_bytes -= size
+            except OSError:
+                pass
+
+    def _list_files(self):
+        files = []
+        if not os.path.isdir(self.directory):
+            return files
+
+        for root, _, names in os.walk(self.directory):
+            for n in names:
+                if not n.endswith(cache_extension):
+                    continue
+
+                path = os.path.join(root, n)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+
+                files.append((path, stat.st_size, stat.st_mtime))
+
+        return files
+
+# endregion
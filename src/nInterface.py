@@ -1,10 +1,13 @@
 # region Imports
 
 import bpy
+import os
 import bmesh
 import mathutils
 from . import nMath
 from . import nUv
+from . import nWatch
+from . import nPreview
 
 # endregion
 
@@ -115,6 +118,104 @@ class NeoUvUiSettings(bpy.types.PropertyGroup):
         default=True
     )
 
+    import_preview_source: bpy.props.EnumProperty(
+        name="Previews",
+        description="What rect previews are made from when importing.",
+        items=(
+            ("PNG", "Project Previews", "Use the preview images stored with each rect in the project file."),
+            ("ATLAS", "Crop Atlas", "Crop the previews out of the atlas, ignoring the preview images in the project file.")
+        ),
+        default="PNG"
+    )
+
+    preview_max_size: bpy.props.IntProperty(
+        name="Preview Size",
+        description="The maximum width and height of previews cropped from the atlas.",
+        default=128,
+        min=8,
+        max=1024
+    )
+
+    import_storage_mode: bpy.props.EnumProperty(
+        name="Storage",
+        description="How the images of newly imported tile maps are stored.",
+        items=(
+            ("PACKED", "Packed", "Pack the images into the blend file."),
+            ("EXTERNAL", "External", "Write the images to a folder shared by the blend files next to this one and reference them by relative path.")
+        ),
+        default="PACKED"
+    )
+
+    import_lazy_previews: bpy.props.BoolProperty(
+        name="Lazy Previews",
+        description="Only create preview images for the pages of rects that are viewed, reading them from the project file on demand.",
+        default=True
+    )
+
+    preview_page_count: bpy.props.IntProperty(
+        name="Preview Pages",
+        description="The number of recently viewed pages to keep lazily created preview images for.",
+        default=8,
+        min=1,
+        max=256
+    )
+
+    import_decode_previews: bpy.props.BoolProperty(
+        name="Decode Previews",
+        description="Decode preview images on worker processes while importing instead of packing them for Blender to decode on first use. Imports with only a few new previews decode them on threads, where pngs using the average or paeth filter are left for Blender.",
+        default=False
+    )
+
+    import_worker_count: bpy.props.IntProperty(
+        name="Decode Workers",
+        description="The number of processes or threads used to decode preview images and read folder imports. 0 uses one per CPU core.",
+        default=0,
+        min=0,
+        max=64
+    )
+
+    cache_enabled: bpy.props.BoolProperty(
+        name="Cache Decoded Images",
+        description="Keep decoded preview images in a cache shared by every blend file, so the same previews are only decoded once. Only previews decoded by Decode Previews are cached, packed pngs are decoded by Blender.",
+        default=True
+    )
+
+    cache_size: bpy.props.IntProperty(
+        name="Cache Size (MB)",
+        description="The maximum size of the image cache on disk. The least recently used images are removed first.",
+        default=256,
+        min=16,
+        max=16384
+    )
+
+    watch_projects: bpy.props.BoolProperty(
+        name="Reload on Change",
+        description="Watch the project files of the tile maps in this scene and reload them when they're saved.",
+        default=False
+    )
+
+    watch_interval: bpy.props.FloatProperty(
+        name="Interval",
+        description="How often the project files are checked for changes, in seconds.",
+        default=1.0,
+        min=0.1,
+        max=60.0
+    )
+
+    live_link_enabled: bpy.props.BoolProperty(
+        name="Live Link",
+        description="Listen for rect and preview changes sent straight from the tile map builder on this machine.",
+        default=False
+    )
+
+    live_link_port: bpy.props.IntProperty(
+        name="Port",
+        description="The local port the live link listens on.",
+        default=47651,
+        min=1024,
+        max=65535
+    )
+
 
 class UtilOpNeoUvUiFirstPage(bpy.types.Operator):
     bl_idname = "neo.uv_uifirstpage"
@@ -136,7 +237,7 @@ class UtilOpNeoUvUiNextPage(bpy.types.Operator):
     collectionIdx: bpy.props.IntProperty()
 
     def invoke(self, context, event):
-        items_len = len(bpy.context.scene.nuv_uvSets[self.collectionIdx].items)
+        items_len = len(bpy.context.scene.nuv_uvSets[self.collectionIdx].get_items())
 
         page = bpy.context.scene.nuv_uvSets[self.collectionIdx].page
         page += 1
@@ -176,6 +277,7 @@ def get_icon_value(name):
 
 
 rect_missing_icon = get_icon_value("CANCEL")
+rect_pending_icon = get_icon_value("TIME")
 
 
 def only_draw_settings_this_frame():
@@ -287,6 +389,61 @@ def ui_draw_settings(layout, context, settings):
     c_col = c_row.column()
     c_col.prop(settings, "mode_unwrap", expand=True)
 
+    # import
+    c_row = container.row()
+    c_row.split(factor=0.3)
+
+    c_row.label(text="Import")
+
+    c_col = c_row.column()
+    import_col = c_col
+    c_col.prop(settings, "import_storage_mode", text="")
+    c_col.prop(settings, "import_preview_source", text="")
+
+    use_pngs = settings.import_preview_source == "PNG"
+
+    c_row_inner = c_col.row()
+    c_row_inner.enabled = not use_pngs
+    c_row_inner.prop(settings, "preview_max_size")
+
+    c_row_inner = c_col.row()
+    c_row_inner.enabled = use_pngs
+    c_row_inner.prop(settings, "import_lazy_previews")
+
+    c_row_inner = c_col.row()
+    c_row_inner.enabled = use_pngs and settings.import_lazy_previews
+    c_row_inner.prop(settings, "preview_page_count")
+
+    c_col.prop(settings, "import_decode_previews")
+
+    c_row_inner = c_col.row()
+    c_row_inner.enabled = settings.import_decode_previews
+    c_row_inner.prop(settings, "import_worker_count")
+
+    c_col = import_col.column()
+    c_col.prop(settings, "cache_enabled")
+
+    c_row_inner = c_col.row()
+    c_row_inner.enabled = settings.cache_enabled
+    c_row_inner.prop(settings, "cache_size")
+    c_row_inner.operator("neo.uvset_clear_image_cache", text="", icon="TRASH")
+
+    c_row_inner = import_col.row()
+    c_row_inner.prop(settings, "watch_projects")
+
+    c_row_inner = c_row_inner.row()
+    c_row_inner.enabled = settings.watch_projects
+    c_row_inner.prop(settings, "watch_interval")
+
+    c_row_inner = import_col.row()
+    c_row_inner.prop(settings, "live_link_enabled")
+
+    c_row_inner = c_row_inner.row()
+    c_row_inner.enabled = settings.live_link_enabled
+    c_row_inner.prop(settings, "live_link_port")
+
+    import_col.operator("neo.uvset_purge_images", icon="ORPHAN_DATA")
+
 
 def ui_draw_manip_tools(layout, context, settings, in_edit_mode):
 
@@ -393,11 +550,37 @@ def ui_draw_collection(collection, idx, max_items_per_row, layout, context, in_e
     if collection.relative_path:
         row = layout.row()
         split = row.split(factor=0.9)
-        split.label(text=collection.relative_path)
+
+        # the sidecar stamp tells us if the project changed without reading it
+        state = nWatch.get_project_state(os.path.abspath(collection.relative_path), collection)
+        label = split.row()
+
+        if state == "MISSING":
+            label.alert = True
+            label.label(text=collection.relative_path + " (missing)", icon="ERROR")
+        elif state == "MODIFIED":
+            label.alert = True
+            label.label(text=collection.relative_path + " (modified)")
+        else:
+            label.label(text=collection.relative_path)
 
         op = split.operator("neo.uv_uireload", text="", icon="FILE_REFRESH")
         op.collectionIdx = idx
 
+        row = layout.row()
+        row.prop(collection, "storage_mode", text="")
+
+        op = row.operator("neo.uvset_pack_images", icon="PACKAGE")
+        op.collectionIdx = idx
+
+        op = row.operator("neo.uvset_publish_library", text="", icon="EXPORT")
+        op.collectionIdx = idx
+
+    if collection.is_linked():
+        library = collection.library_scene.library
+        layout.label(text="Linked from " + (library.filepath if library is not None else collection.library_scene.name),
+                     icon="LINK_BLEND")
+
     row = layout.row()
     op = row.operator("view3d.nuv_set_uv_rect_selector", text="Select UV", icon="UV_FACESEL", emboss=True)
     op.collectionIdx = idx
@@ -421,7 +604,7 @@ def ui_draw_collection_patterns(collection, idx, layout, in_edit_mode):
     if not collection.patterns_expanded:
         return
 
-    patterns_len = len(collection.patterns.items())
+    patterns_len = len(collection.patterns)
 
     row = layout.row()
 
@@ -490,7 +673,7 @@ def ui_draw_collection_patterns(collection, idx, layout, in_edit_mode):
     pattern_layout = pattern_box.column()
     pattern_idx = -1
 
-    pattern_len = len(active_pattern.items.items())
+    pattern_len = len(active_pattern.items)
     for pattern_rect in active_pattern.items:
         pattern_idx += 1
 
@@ -499,10 +682,9 @@ def ui_draw_collection_patterns(collection, idx, layout, in_edit_mode):
         if rect is None:
             preview_image = None
         else:
-            preview_image = get_image_by_name(rect.previewName)
+            preview_image = nPreview.request_preview(collection, pattern_rect.rect_idx, "pattern")
 
-        if preview_image is not None and bpy.app.version[0] >= 3:
-            preview_image.preview_ensure()
+        icon_id = None if preview_image is None else nPreview.get_icon_id(preview_image)
 
         row = pattern_layout.row()
         row.alignment = "CENTER"
@@ -510,8 +692,10 @@ def ui_draw_collection_patterns(collection, idx, layout, in_edit_mode):
 
         col = split.column()
 
-        if preview_image is None: col.template_icon(icon_value=rect_missing_icon, scale=nuv_pattern_preview_scale)
-        else: col.template_icon(icon_value=preview_image.preview.icon_id, scale=nuv_pattern_preview_scale)
+        if rect is None: col.template_icon(icon_value=rect_missing_icon, scale=nuv_pattern_preview_scale)
+        elif preview_image is None: col.template_icon(icon_value=get_preview_pending_icon(collection, rect), scale=nuv_pattern_preview_scale)
+        elif icon_id is None: col.template_icon(icon_value=rect_pending_icon, scale=nuv_pattern_preview_scale)
+        else: col.template_icon(icon_value=icon_id, scale=nuv_pattern_preview_scale)
 
         col = split.column()
         col.separator(factor=0.25)
@@ -545,7 +729,7 @@ def ui_draw_collection_rect_list(collection, idx, max_items_per_row, layout, in_
     if not collection.items_expanded:
         return
 
-    items = collection.items
+    items = collection.get_items()
     item_len = len(items)
 
     layout = layout.box()
@@ -582,17 +766,19 @@ def ui_draw_collection_rect_list(collection, idx, max_items_per_row, layout, in_
 
         item = items[j]
 
-        # try to get preview image
-        preview_image = get_image_by_name(item.previewName)
-        if preview_image is None:
+        # try to get preview image, lazy previews are created after drawing
+        preview_image = nPreview.request_preview(collection, j, collection.page)
+        if preview_image is None and item.previewLength <= 0:
             continue
 
-        if bpy.app.version[0] >= 3:
-            preview_image.preview_ensure()
+        icon_id = None if preview_image is None else nPreview.get_icon_id(preview_image)
 
         # draw button grid
         col = image_row.column()
-        col.template_icon(icon_value=preview_image.preview.icon_id, scale=nuv_preview_scale)
+
+        if preview_image is None: col.template_icon(icon_value=get_preview_pending_icon(collection, item), scale=nuv_preview_scale)
+        elif icon_id is None: col.template_icon(icon_value=rect_pending_icon, scale=nuv_preview_scale)
+        else: col.template_icon(icon_value=icon_id, scale=nuv_preview_scale)
 
         op = col.operator("neo.uv_setuvrect", text="Apply")
         op.collectionIdx = idx
@@ -601,6 +787,14 @@ def ui_draw_collection_rect_list(collection, idx, max_items_per_row, layout, in_
         row_i += 1
 
 
+def get_preview_pending_icon(collection, rect):
+    """
+    Returns the icon to show for a rect whose preview image hasn't been created.
+    """
+
+    return rect_missing_icon if nPreview.is_failed(collection, rect) else rect_pending_icon
+
+
 def get_image_by_name(n):
     """
     Returns an image based on its name.
@@ -0,0 +1,187 @@
+# region Imports
+
+import bpy
+from bpy_extras.io_utils import ExportHelper, ImportHelper
+from bpy.props import *
+from . import nData
+from . import nPreview
+
+# endregion
+
+# region Settings
+
+# library scenes holding published collections start with this, so linking can find them
+library_scene_prefix = "NeoTileMap "
+
+# endregion
+
+# region Methods
+
+
+def collect_images(collection):
+    """Creates every preview of a collection and returns its atlas and preview images, ready to be published.
+
+    Returns:
+        tuple: The images and the number of images that couldn't be created.
+    """
+
+    # lazy previews that were never viewed don't exist yet
+    nPreview.create_previews(collection, range(len(collection.items)), evictable=False)
+
+    names = {r.previewName for r in collection.items}
+    images = []
+    missing = 0
+
+    for name in names:
+        image = bpy.data.images.get(name)
+        if image is None:
+            missing += 1
+            continue
+
+        # linked previews can't be evicted or have their icons written
+        if nPreview.lazy_preview_tag in image:
+            del image[nPreview.lazy_preview_tag]
+
+        if not image.get(nData.preview_icon_tag):
+            nData.ImportRectData.set_preview_icon(image, nData.ImportRectData.get_image_pixels(image))
+
+        images.append(image)
+
+    atlas = bpy.data.images.get("Atlas_" + collection.name)
+    if atlas is not None:
+        images.append(atlas)
+
+    return images, missing
+
+
+def link_collections(scene, library_scene):
+    """Points the collections of a scene at the collections published in a linked library scene.
+
+    Local rects are cleared, patterns are kept and resolved against the linked rects.
+
+    Returns:
+        int: The number of collections that were linked.
+    """
+    linked = 0
+
+    for source in library_scene.nuv_uvSets:
+        collection = scene.nuv_uvSets.get(source.name)
+        if collection is None:
+            collection = scene.nuv_uvSets.add()
+            collection.name = source.name
+
+        collection.clear()
+        collection.relative_path = ""
+        collection.preview_source = ""
+        collection.image_storage = ""
+        collection.library_scene = library_scene
+        collection.update_pattern_indicies()
+
+        linked += 1
+
+    return linked
+
+# endregion
+
+# region Operators
+
+
+class NeoTilePublishLibrary(bpy.types.Operator, ExportHelper):
+    bl_idname = "neo.uvset_publish_library"
+    bl_label = "Publish to Library"
+    bl_description = "Writes the tile map and its images to a library blend file that other blend files can link."
+
+    filename_ext = ".blend"
+    filter_glob: StringProperty(default="*.blend", options={'HIDDEN'})
+
+    collectionIdx: IntProperty(options={'HIDDEN'})
+
+    def execute(self, context):
+        collection = context.scene.nuv_uvSets[self.collectionIdx]
+
+        if collection.is_linked():
+            self.report({"ERROR"}, "\"" + collection.name + "\" is already linked from a library.")
+            return {'CANCELLED'}
+
+        images, missing = collect_images(collection)
+
+        # the library is a scene with just this collection, which references its images so they're linked with it
+        scene = bpy.data.scenes.new(library_scene_prefix + collection.name)
+
+        try:
+            published = scene.nuv_uvSets.add()
+            nData.copy_property_group(collection, published)
+            published.patterns.clear()
+            published.active_pattern = -1
+
+            for image in images:
+                published.image_refs.add().image = image
+
+            bpy.data.libraries.write(self.filepath, {scene}, path_remap="RELATIVE", fake_user=True, compress=True)
+        finally:
+            bpy.data.scenes.remove(scene)
+
+        self.report({"INFO"}, "Published \"" + collection.name + "\" with " + str(len(images)) + " images.")
+
+        if missing:
+            self.report({"WARNING"}, str(missing) + " previews couldn't be created, reload the tile map and publish again.")
+
+        return {'FINISHED'}
+
+
+class NeoTileLinkLibrary(bpy.types.Operator, ImportHelper):
+    bl_idname = "neo.uvset_link_library"
+    bl_label = "Link Tile Map Library"
+    bl_description = "Links the tile maps published to a library blend file, reading their rects and images from it without copying them."
+
+    filename_ext = ".blend"
+    filter_glob: StringProperty(default="*.blend", options={'HIDDEN'})
+
+    def execute(self, context):
+        with bpy.data.libraries.load(self.filepath, link=True, relative=True) as (data_from, data_to):
+            data_to.scenes = [n for n in data_from.scenes if n.startswith(library_scene_prefix)]
+
+        linked = 0
+        for library_scene in data_to.scenes:
+            if library_scene is not None:
+                linked += link_collections(context.scene, library_scene)
+
+        if linked == 0:
+            self.report({"ERROR"}, "The file doesn't contain any published tile maps.")
+            return {'CANCELLED'}
+
+        # local copies of the linked images aren't needed anymore
+        nData.purge_unused_images()
+
+        self.report({"INFO"}, "Linked " + str(linked) + " tile maps.")
+        return {'FINISHED'}
+
+# endregion
+
+# region Blender
+
+
+classes = (
+    NeoTilePublishLibrary,
+    NeoTileLinkLibrary,
+)
+
+
+def menu_import(self, context):
+    self.layout.operator(NeoTileLinkLibrary.bl_idname, text="Neognosis Tile Set Library (.blend)")
+
+
+def register():
+    for c in classes:
+        bpy.utils.register_class(c)
+
+    bpy.types.TOPBAR_MT_file_import.append(menu_import)
+
+
+def unregister():
+    for c in classes:
+        bpy.utils.unregister_class(c)
+
+    bpy.types.TOPBAR_MT_file_import.remove(menu_import)
+
+# endregion
@@ -0,0 +1,406 @@
+# region Imports
+
+import bpy
+import hashlib
+import json
+import math
+import socket
+import struct
+import time
+from collections import deque
+from . import nData
+from . import nPng
+from . import nPreview
+from . import nProject
+
+# endregion
+
+# region Settings
+
+# every message is this header followed by a utf-8 json object and a binary payload:
+#   {"type": "rect_add", "collection": name, "verts": [8 floats]}     payload is the preview png, adds or updates a rect
+#   {"type": "rect_move", "collection": name, "verts": [...], "to": [...]}
+#   {"type": "rect_remove", "collection": name, "verts": [...]}
+#   {"type": "preview", "collection": name, "verts": [...]}           payload is the new preview png of the rect
+#   {"type": "atlas", "collection": name}                             payload is the new atlas png
+# vertices are top left, top right, bottom right and bottom left x/y pairs from -1 to 1, like in project files.
+message_magic = b"NTLL"
+
+# magic, json length, payload length
+message_header = struct.Struct("<4sII")
+
+message_max_bytes = 64 * 1024 * 1024
+
+# how often the listener is polled while it's on, and how often the setting is checked while it's off, in seconds
+poll_interval = 0.05
+idle_interval = 1.0
+
+# the longest applying messages may take per poll, in seconds
+apply_time = 0.02
+
+recv_size = 1024 * 1024
+
+server = None
+server_port = None
+failed_port = None
+clients = []
+messages = deque()
+
+
+class LiveLinkError(Exception):
+    """Raised when a live link message can't be applied."""
+
+
+class LiveLinkClient:
+    """A connection from the tile map builder and the bytes received from it that don't form a message yet."""
+
+    def __init__(self, sock, address):
+        self.sock = sock
+        self.address = address
+        self.buffer = bytearray()
+        self.closed = False
+
+# endregion
+
+# region Server Methods
+
+
+def start(port):
+    """Starts listening for connections from the tile map builder on the local machine."""
+    global server, server_port, failed_port
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(("127.0.0.1", port))
+        sock.listen()
+        sock.setblocking(False)
+    except OSError as e:
+        sock.close()
+
+        # only complain once per port, the poll retries every time
+        if failed_port != port:
+            print("Couldn't start the live link on port " + str(port) + ": " + str(e))
+            failed_port = port
+
+        return False
+
+    server = sock
+    server_port = port
+    failed_port = None
+    print("Live link listening on port " + str(port))
+
+    return True
+
+
+def stop():
+    """Closes the listener and every connection."""
+    global server, server_port
+
+    for c in clients:
+        c.sock.close()
+    clients.clear()
+    messages.clear()
+
+    if server is not None:
+        server.close()
+
+    server = None
+    server_port = None
+
+
+def accept_clients():
+    while True:
+        try:
+            sock, address = server.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+
+        sock.setblocking(False)
+        clients.append(LiveLinkClient(sock, address))
+
+
+def receive(client):
+    """Reads everything a client has sent without blocking and queues its complete messages."""
+    while True:
+        try:
+            data = client.sock.recv(recv_size)
+        except (BlockingIOError, InterruptedError):
+            break
+        except OSError:
+            client.closed = True
+            break
+
+        if not data:
+            client.closed = True
+            break
+
+        client.buffer += data
+
+    buffer = client.buffer
+    offset = 0
+
+    while len(buffer) - offset >= message_header.size:
+        magic, json_len, payload_len = message_header.unpack_from(buffer, offset)
+
+        if magic != message_magic or json_len + payload_len > message_max_bytes:
+            print("Dropping live link connection from " + str(client.address) + ", it sent an invalid message.")
+            client.closed = True
+            break
+
+        end = offset + message_header.size + json_len + payload_len
+        if len(buffer) < end:
+            break
+
+        start_payload = offset + message_header.size + json_len
+
+        try:
+            header = json.loads(bytes(buffer[offset + message_header.size:start_payload]).decode("utf-8"))
+        except (UnicodeDecodeError, ValueError):
+            header = None
+
+        if isinstance(header, dict):
+            messages.append((header, bytes(buffer[start_payload:end])))
+        else:
+            print("Skipping a live link message from " + str(client.address) + " with an invalid header.")
+
+        offset = end
+
+    del buffer[:offset]
+
+
+def poll():
+    """Accepts connections, receives messages and applies as many as fit in a slice, while the setting is on."""
+    scene = bpy.context.scene
+    settings = getattr(scene, "nuv_settings", None) if scene is not None else None
+
+    if settings is None or not settings.live_link_enabled:
+        if server is not None:
+            stop()
+
+        return idle_interval
+
+    if server_port != settings.live_link_port:
+        stop()
+        if not start(settings.live_link_port):
+            return idle_interval
+
+    accept_clients()
+
+    for c in clients:
+        receive(c)
+
+    for c in [c for c in clients if c.closed]:
+        c.sock.close()
+        clients.remove(c)
+
+    if messages and apply_messages(scene):
+        for area in bpy.context.screen.areas if bpy.context.screen else []:
+            if area.type == "VIEW_3D":
+                area.tag_redraw()
+
+    return poll_interval
+
+# endregion
+
+# region Apply Methods
+
+
+def apply_messages(scene, max_time=apply_time):
+    """Applies queued messages until they run out or max_time passes, returning whether any were applied."""
+    start_time = time.perf_counter()
+    indices = {}
+    touched = set()
+
+    while messages and time.perf_counter() - start_time < max_time:
+        header, payload = messages.popleft()
+
+        try:
+            name = apply_message(scene, header, payload, indices)
+        except LiveLinkError as e:
+            print("Couldn't apply live link message \"" + str(header.get("type")) + "\": " + str(e))
+            continue
+        except Exception as e:
+            # the timer stops for good if it raises, and the collection may have been changed half way
+            print("Couldn't apply live link message \"" + str(header.get("type")) + "\", it failed unexpectedly: " +
+                  repr(e))
+
+            name = header.get("collection")
+            if isinstance(name, str):
+                indices.pop(name, None)
+                touched.add(name)
+
+            continue
+
+        touched.add(name)
+
+    for name in touched:
+        collection = scene.nuv_uvSets.get(name)
+        if collection is None:
+            continue
+
+        # the collection no longer matches its project file, so the next import compares every chunk again
+        collection.chunks.clear()
+        collection.bump_generation()
+        collection.update_pattern_indicies()
+
+    return bool(touched)
+
+
+def apply_message(scene, header, payload, indices):
+    """Applies one message to its collection, returning the name of the collection.
+
+    Args:
+        scene (bpy.types.Scene): The scene with the collection.
+        header (dict): The json header of the message.
+        payload (bytes): The binary payload of the message.
+        indices (dict): Rect indices by rect key of the collections changed so far, by collection name.
+    """
+    kind = header.get("type")
+    name = header.get("collection")
+
+    if not isinstance(name, str) or not name:
+        raise LiveLinkError("The message doesn't name a collection.")
+
+    collection = scene.nuv_uvSets.get(name)
+
+    if collection is None:
+        if kind not in ("rect_add", "atlas"):
+            raise LiveLinkError("There's no collection called \"" + name + "\".")
+
+        collection = nData.ImportRectData.add_collection(name, "")
+
+    if collection.is_linked():
+        raise LiveLinkError("\"" + name + "\" is linked from a library.")
+
+    directory = nData.get_storage_directory(collection)
+
+    if kind == "atlas":
+        check_png(payload)
+        nData.ImportRectData.add_image(payload, "Atlas_" + name, directory=directory)
+        return name
+
+    index = indices.get(name)
+    if index is None:
+        index = indices[name] = nData.build_rect_index(collection)
+
+    verts = get_verts(header, "verts")
+    key = nProject.rect_key(verts)
+    items = collection.items
+
+    if kind == "rect_add":
+        idx = index.get(key)
+        if idx is None:
+            items.add()
+            idx = index[key] = len(items) - 1
+
+        rect = items[idx]
+        if payload:
+            set_preview(collection, rect, payload, directory)
+        else:
+            keep_preview(collection, rect, idx)
+
+        nData.ImportRectData.setup_rect(nData.ImportRectData.to_verts(*verts), rect.previewName, rect)
+        detach_rect(rect)
+        return name
+
+    idx = index.get(key)
+    if idx is None:
+        raise LiveLinkError("\"" + name + "\" doesn't have a rect at " + str(verts) + ".")
+
+    rect = items[idx]
+
+    if kind == "rect_move":
+        to = get_verts(header, "to")
+        keep_preview(collection, rect, idx)
+
+        nData.ImportRectData.setup_rect(nData.ImportRectData.to_verts(*to), rect.previewName, rect)
+        detach_rect(rect)
+
+        del index[key]
+        index.setdefault(nProject.rect_key(to), idx)
+    elif kind == "rect_remove":
+        items.remove(idx)
+
+        # every rect after it moved down
+        del indices[name]
+    elif kind == "preview":
+        set_preview(collection, rect, payload, directory)
+        detach_rect(rect)
+    else:
+        raise LiveLinkError("Unknown message type.")
+
+    return name
+
+
+def get_verts(header, field):
+    verts = header.get(field)
+
+    if (not isinstance(verts, list) or len(verts) != 8 or
+            not all(isinstance(v, (int, float)) and not isinstance(v, bool) and math.isfinite(v) for v in verts)):
+        raise LiveLinkError("\"" + field + "\" should be 8 finite vertex coordinates.")
+
+    return [float(v) for v in verts]
+
+
+def check_png(payload):
+    if payload[:len(nPng.png_signature)] != nPng.png_signature:
+        raise LiveLinkError("The payload isn't a png.")
+
+
+def set_preview(collection, rect, png, directory):
+    """Points a rect at the preview image for png data, adding the image if no rect shares it yet.
+
+    An existing image may be a lazy preview of another rect, which would be evicted and never created again for this
+    one, so it's kept like keep_preview does.
+    """
+    check_png(png)
+
+    preview_name = nData.ImportRectData.get_preview_name(collection.name, hashlib.sha256(png).hexdigest())
+    image = bpy.data.images.get(preview_name)
+    if image is None:
+        image = nData.ImportRectData.add_image(png, preview_name, directory=directory)
+
+    if nPreview.lazy_preview_tag in image:
+        del image[nPreview.lazy_preview_tag]
+
+    rect.previewName = preview_name
+
+
+def keep_preview(collection, rect, idx):
+    """Makes sure a rect has a preview image that won't be evicted, since it can't be read from the project file
+    once the rect is detached from it."""
+    image = bpy.data.images.get(rect.previewName)
+
+    if image is None and rect.previewLength > 0:
+        nPreview.create_previews(collection, [idx], evictable=False)
+        image = bpy.data.images.get(rect.previewName)
+
+    if image is not None and nPreview.lazy_preview_tag in image:
+        del image[nPreview.lazy_preview_tag]
+
+
+def detach_rect(rect):
+    """Marks a rect as no longer matching its project file, so its preview isn't read from there and the next
+    import writes it again."""
+    rect.previewOffset = 0
+    rect.previewLength = 0
+    rect.contentHash = ""
+
+# endregion
+
+# region Blender
+
+
+def register():
+    bpy.app.timers.register(poll, first_interval=idle_interval, persistent=True)
+
+
+def unregister():
+    if bpy.app.timers.is_registered(poll):
+        bpy.app.timers.unregister(poll)
+
+    stop()
+
+# endregion
@@ -11,6 +11,7 @@ from . import nMath
 from . import nUtil
 from . import nUv
 from . import nInterface
+from . import nRectTable
 
 from mathutils import Vector
 from mathutils.bvhtree import BVHTree
@@ -90,7 +91,6 @@ class NeoPaint(bpy.types.Operator):
         self.left_mouse_held = False
 
         self.collection = nData.get_collection_by_idx(self.collectionIdx)
-        self.rect = self.collection.get_rect(self.rectIdx)
 
         # setup handlers
         self.handle_v = bpy.types.SpaceView3D.draw_handler_add(self.draw_callback_v, (self, context), "WINDOW",
@@ -128,6 +128,11 @@ class NeoPaint(bpy.types.Operator):
         correct_aspect = bpy.context.scene.nuv_settings.correct_aspect_ratio
         snap_mode = bpy.context.scene.nuv_settings.snap_mode
 
+        # the rect may have been removed since it was picked
+        table = nRectTable.get_table(self.collection)
+        if self.rectIdx >= len(table):
+            return
+
         # get active uv layer
         layer = self.edit_mesh.loops.layers.uv
         uv_layer = layer.verify()
@@ -135,7 +140,7 @@ class NeoPaint(bpy.types.Operator):
         # update uv
         face = {face}
         nUv.unwrap_auto(space_mode, False, context, self.obj.matrix_world, face,
-                        unwrap_mode, correct_aspect, snap_mode, self.rect, uv_layer)
+                        unwrap_mode, correct_aspect, snap_mode, table.get_uvs(self.rectIdx), uv_layer)
 
         nUv.paint_post_unwrap(event, face, uv_layer)
 
@@ -162,10 +167,9 @@ class NeoPaint(bpy.types.Operator):
         layer = self.edit_mesh.loops.layers.uv
         uv_layer = layer.verify()
 
-        new_rect, new_rect_idx = nUv.get_best_rect_for_face(face, uv_layer, self.collection)
-        if new_rect is not None:
+        new_rect_idx = nUv.get_best_rect_for_face(face, uv_layer, self.collection)
+        if new_rect_idx > -1:
             self.report({"INFO"}, "Picked rect from face.")
-            self.rect = new_rect
             self.rectIdx = new_rect_idx
         else:
             self.report({"ERROR"}, "Couldn't find a relevant rect to pick from the face.")
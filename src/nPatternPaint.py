@@ -10,6 +10,7 @@ from . import nData
 from . import nMath
 from . import nUtil
 from . import nUv
+from . import nRectTable
 
 from mathutils import Vector
 from mathutils.bvhtree import BVHTree
@@ -91,8 +92,7 @@ class NeoPatternPaint(bpy.types.Operator):
 
         self.collection = nData.get_collection_by_idx(self.collectionIdx)
         self.pattern = self.collection.get_active_pattern()
-        self.items = self.pattern.items.items()
-        self.pattern_len = len(self.items)
+        self.read_pattern()
 
         self.paint_idx = 0
 
@@ -103,6 +103,16 @@ class NeoPatternPaint(bpy.types.Operator):
 
         return {'RUNNING_MODAL'}
 
+    def read_pattern(self):
+        self.rect_indices = self.pattern.get_rect_indices()
+        self.pattern_len = len(self.rect_indices)
+
+        # the entries are resolved again whenever the rects or the patterns change
+        self.pattern_generation = self.get_pattern_generation()
+
+    def get_pattern_generation(self):
+        return self.collection.get_source().generation, self.collection.pattern_generation
+
     def draw_filled_face(self, face, world_matrix):
         if not self.edit_mesh.is_valid: return
         # wire
@@ -134,18 +144,20 @@ class NeoPatternPaint(bpy.types.Operator):
         layer = self.edit_mesh.loops.layers.uv
         uv_layer = layer.verify()
 
+        if self.get_pattern_generation() != self.pattern_generation:
+            self.read_pattern()
+
         # idx update
         if self.pattern.use_random: self.paint_idx = random.randrange(0, self.pattern_len)
         elif self.paint_idx > self.pattern_len - 1: self.paint_idx = 0
 
         # update uv
-        pattern_rect = self.items[self.paint_idx][1]
-
-        if pattern_rect.rect_idx > -1:
-            rect = pattern_rect.get_rect(self.collection)
+        rect_idx = self.rect_indices[self.paint_idx]
+        table = nRectTable.get_table(self.collection)
 
+        if -1 < rect_idx < len(table):
             nUv.unwrap_auto(space_mode, False, context, self.obj.matrix_world, {face},
-                            unwrap_mode, correct_aspect, snap_mode, rect, uv_layer)
+                            unwrap_mode, correct_aspect, snap_mode, table.get_uvs(rect_idx), uv_layer)
 
         # increment and update
         self.paint_idx += 1
@@ -0,0 +1,383 @@
+# region Imports
+
+import struct
+import zlib
+import numpy as np
+
+# endregion
+
+# region Settings
+
+png_signature = b"\x89PNG\r\n\x1a\n"
+
+# samples per pixel for each png color type
+color_type_samples = {
+    0: 1,  # greyscale
+    2: 3,  # rgb
+    3: 1,  # palette
+    4: 2,  # greyscale and alpha
+    6: 4,  # rgba
+}
+
+# the average and paeth filters depend on the byte before in the same row, so they're reversed a byte at a time in
+# python, which is around a hundred times slower than the other filters and holds the GIL while it runs
+slow_filter_types = (3, 4)
+
+# when slow filters aren't allowed the image data is inflated this many rows at a time, so a png using them is
+# rejected after its first few rows
+inflate_block_rows = 8
+
+# endregion
+
+# region Exceptions
+
+
+class PngError(Exception):
+    """Raised when png data can't be decoded."""
+
+
+class SlowFilterError(PngError):
+    """Raised when a png uses the average or paeth filter and decoding it with those filters was ruled out, so it can
+    be left to a native decoder instead."""
+
+# endregion
+
+# region Decoding
+
+
+class PngImage:
+    """Contains a decoded png.
+
+    pixels is a flat RGBA array in Blender's pixel order, starting from the bottom left. It's float32 unless the
+    png was decoded without converting to float, then it's uint8.
+    """
+
+    def __init__(self, width, height, pixels):
+        self.width = width
+        self.height = height
+        self.pixels = pixels
+
+
+def decode(data, as_float=True, allow_slow_filters=True):
+    """Decodes png data into RGBA pixels. Interlaced pngs aren't supported.
+
+    Args:
+        data (bytes): The png data to decode. Any bytes-like object is accepted.
+        as_float (bool): Whether to convert the pixels to float, large images take a quarter of the memory as uint8.
+        allow_slow_filters (bool): Whether to decode pngs with rows using the average or paeth filter, or raise
+            SlowFilterError as soon as the first such row is inflated. Only worth it off the main thread in a separate
+            process.
+
+    Returns:
+        PngImage: The decoded image.
+    """
+    view = memoryview(data)
+
+    if bytes(view[:8]) != png_signature:
+        raise PngError("Missing png signature.")
+
+    header = None
+    palette = None
+    transparency = None
+    idat = []
+
+    # read chunks
+    offset = 8
+    data_len = len(view)
+    while offset + 8 <= data_len:
+        chunk_len, chunk_type = struct.unpack_from(">I4s", view, offset)
+        chunk_start = offset + 8
+        chunk_end = chunk_start + chunk_len
+
+        if chunk_end + 4 > data_len:
+            raise PngError("The " + chunk_type.decode("latin-1") + " chunk is truncated.")
+
+        if chunk_type == b"IHDR":
+            header = struct.unpack_from(">IIBBBBB", view, chunk_start)
+        elif chunk_type == b"PLTE":
+            palette = np.frombuffer(view[chunk_start:chunk_end], dtype=np.uint8).reshape(-1, 3)
+        elif chunk_type == b"tRNS":
+            transparency = bytes(view[chunk_start:chunk_end])
+        elif chunk_type == b"IDAT":
+            idat.append(view[chunk_start:chunk_end])
+        elif chunk_type == b"IEND":
+            break
+
+        offset = chunk_end + 4
+
+    if header is None:
+        raise PngError("Missing IHDR chunk.")
+
+    width, height, bit_depth, color_type, _, _, interlace = header
+
+    if color_type not in color_type_samples:
+        raise PngError("Unknown color type " + str(color_type) + ".")
+
+    if interlace != 0:
+        raise PngError("Interlaced pngs aren't supported.")
+
+    samples = color_type_samples[color_type]
+    bits_per_pixel = samples * bit_depth
+    bpp = max(1, bits_per_pixel // 8)
+    stride = (width * bits_per_pixel + 7) // 8
+
+    # inflate and unfilter
+    raw = inflate(idat, stride, height, allow_slow_filters)
+
+    if len(raw) < (stride + 1) * height:
+        raise PngError("The image data is truncated.")
+
+    rows = unfilter(raw, height, stride, bpp)
+
+    # expand samples
+    if bit_depth == 16:
+        values = rows.reshape(height, -1, 2)[:, :, 0]
+    elif bit_depth < 8:
+        values = np.unpackbits(rows, axis=1).reshape(height, -1, bit_depth)
+        weights = (1 << np.arange(bit_depth - 1, -1, -1)).astype(np.uint8)
+        values = (values * weights).sum(axis=2, dtype=np.uint8)
+    else:
+        values = rows
+
+    values = values[:, :width * samples].reshape(height, width, samples)
+
+    rgba = to_rgba(values, color_type, bit_depth, palette, transparency)
+    if as_float:
+        rgba = rgba.astype(np.float32) / 255.0
+
+    return PngImage(width, height, rgba)
+
+
+def inflate(idat, stride, height, allow_slow_filters=True):
+    """Inflates the image data of a png.
+
+    Args:
+        idat (list): The data of each IDAT chunk, in order.
+        stride (int): The number of bytes in a row, without its filter type byte.
+        height (int): The number of rows.
+        allow_slow_filters (bool): Whether rows using the average or paeth filter are allowed. If not, the filter
+            type of each row is checked as soon as it's inflated and SlowFilterError is raised for the first one using
+            them, so most of the png is never inflated.
+
+    Returns:
+        bytes: The inflated image data.
+    """
+    inflater = zlib.decompressobj()
+
+    if allow_slow_filters:
+        return b"".join(inflater.decompress(d) for d in idat) + inflater.flush()
+
+    row_len = stride + 1
+    block_size = row_len * inflate_block_rows
+    filters_end = row_len * height
+    parts = []
+    inflated = 0
+    next_filter = 0
+
+    def check(out):
+        nonlocal next_filter
+        if next_filter >= filters_end:
+            return
+
+        filters = out[next_filter - inflated:filters_end - inflated:row_len]
+        if any(f in slow_filter_types for f in filters):
+            raise SlowFilterError("The png uses the average or paeth filter.")
+
+        next_filter += len(filters) * row_len
+
+    for d in idat:
+        data = d
+        while data:
+            out = inflater.decompress(data, block_size)
+            data = inflater.unconsumed_tail
+
+            check(out)
+            parts.append(out)
+            inflated += len(out)
+
+    out = inflater.flush()
+    check(out)
+    parts.append(out)
+
+    return b"".join(parts)
+
+
+def unfilter(raw, height, stride, bpp):
+    """Reverses the png scanline filters.
+
+    Args:
+        raw (bytes): The inflated image data, one filter type byte followed by stride bytes per row.
+        height (int): The number of rows.
+        stride (int): The number of bytes in a row.
+        bpp (int): The number of bytes per complete pixel, rounded up to one.
+
+    Returns:
+        numpy.ndarray: A (height, stride) uint8 array of unfiltered rows.
+    """
+    scanlines = np.frombuffer(raw, dtype=np.uint8, count=(stride + 1) * height).reshape(height, stride + 1)
+    filters = scanlines[:, 0]
+    rows = scanlines[:, 1:].copy()
+
+    prior = np.zeros(stride, dtype=np.uint8)
+    for y in range(height):
+        row = rows[y]
+        filter_type = filters[y]
+
+        if filter_type == 1:
+            row[:] = np.cumsum(row.reshape(-1, bpp), axis=0, dtype=np.uint8).reshape(-1)
+        elif filter_type == 2:
+            row += prior
+        elif filter_type == 3:
+            cur = row.tolist()
+            up = prior.tolist()
+            for x in range(stride):
+                left = cur[x - bpp] if x >= bpp else 0
+                cur[x] = (cur[x] + ((left + up[x]) >> 1)) & 0xFF
+            row[:] = cur
+        elif filter_type == 4:
+            cur = row.tolist()
+            up = prior.tolist()
+            for x in range(stride):
+                a = cur[x - bpp] if x >= bpp else 0
+                b = up[x]
+                c = up[x - bpp] if x >= bpp else 0
+                p = a + b - c
+                pa = abs(p - a)
+                pb = abs(p - b)
+                pc = abs(p - c)
+                if pa <= pb and pa <= pc: pred = a
+                elif pb <= pc: pred = b
+                else: pred = c
+                cur[x] = (cur[x] + pred) & 0xFF
+            row[:] = cur
+        elif filter_type != 0:
+            raise PngError("Unknown filter type " + str(filter_type) + ".")
+
+        prior = row
+
+    return rows
+
+
+def to_rgba(values, color_type, bit_depth, palette, transparency):
+    """Converts unpacked png samples into a flat, bottom up uint8 RGBA array."""
+    height, width, _ = values.shape
+    rgba = np.empty((height, width, 4), dtype=np.uint8)
+    max_value = 255 if bit_depth >= 8 else (1 << bit_depth) - 1
+
+    if color_type == 3:
+        if palette is None:
+            raise PngError("Missing palette.")
+
+        alpha = np.full(len(palette), 255, dtype=np.uint8)
+        if transparency:
+            t = np.frombuffer(transparency, dtype=np.uint8)[:len(palette)]
+            alpha[:len(t)] = t
+
+        indices = values[:, :, 0]
+        if indices.max(initial=0) >= len(palette):
+            raise PngError("Palette index out of range.")
+
+        rgba[:, :, :3] = palette[indices]
+        rgba[:, :, 3] = alpha[indices]
+    else:
+        scale = 255 // max_value
+        if color_type in (0, 4):
+            rgba[:, :, :3] = values[:, :, :1] * scale
+        else:
+            rgba[:, :, :3] = values[:, :, :3]
+
+        if color_type in (4, 6):
+            rgba[:, :, 3] = values[:, :, -1]
+        else:
+            rgba[:, :, 3] = 255
+
+    return np.ascontiguousarray(rgba[::-1]).reshape(-1)
+
+# endregion
+
+# region Resampling
+
+
+def crop(image, left, bottom, right, top, max_size):
+    """Crops a region out of an image and box filters it down to fit within a maximum size.
+
+    Args:
+        image (PngImage): The image to crop, with float32 or uint8 pixels.
+        left (int): The first column of the region.
+        bottom (int): The first row of the region, counting from the bottom.
+        right (int): The column after the region.
+        top (int): The row after the region.
+        max_size (int): The maximum width and height of the result.
+
+    Returns:
+        PngImage: The cropped image with float32 pixels.
+    """
+    pixels = image.pixels.reshape(image.height, image.width, 4)
+
+    left = min(max(left, 0), image.width - 1)
+    bottom = min(max(bottom, 0), image.height - 1)
+    right = min(max(right, left + 1), image.width)
+    top = min(max(top, bottom + 1), image.height)
+
+    region = pixels[bottom:top, left:right].astype(np.float32)
+    if pixels.dtype == np.uint8:
+        region /= 255.0
+
+    height, width, _ = region.shape
+    scale = max(width, height) / max_size
+
+    if scale > 1:
+        out_width = max(1, int(width / scale))
+        out_height = max(1, int(height / scale))
+
+        # sum each block of source pixels, then divide by the block sizes
+        columns = (np.arange(out_width) * width) // out_width
+        rows = (np.arange(out_height) * height) // out_height
+
+        region = np.add.reduceat(np.add.reduceat(region, rows, axis=0), columns, axis=1)
+        region /= (np.diff(rows, append=height)[:, None, None] * np.diff(columns, append=width)[None, :, None])
+
+        width, height = out_width, out_height
+
+    return PngImage(width, height, region.reshape(-1))
+
+# endregion
+
+# region Encoding
+
+
+def encode(width, height, rgba):
+    """Encodes 8 bit RGBA pixels into png data without any filtering.
+
+    Args:
+        width (int): The width of the image.
+        height (int): The height of the image.
+        rgba (bytes): The pixels, 4 bytes per pixel starting from the top left.
+
+    Returns:
+        bytes: The png data.
+    """
+    rows = np.frombuffer(bytes(rgba), dtype=np.uint8).reshape(height, width * 4)
+    scanlines = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    scanlines[:, 1:] = rows
+
+    def chunk(chunk_type, data):
+        return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+
+    return (png_signature +
+            chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)) +
+            chunk(b"IDAT", zlib.compress(scanlines.tobytes())) +
+            chunk(b"IEND", b""))
+
+
+def encode_image(image):
+    """Encodes a decoded PngImage back into png data."""
+    pixels = image.pixels
+    if pixels.dtype != np.uint8:
+        pixels = np.round(np.clip(pixels, 0.0, 1.0) * 255.0).astype(np.uint8)
+
+    # flip back to top down rows
+    rows = pixels.reshape(image.height, image.width * 4)[::-1]
+    return encode(image.width, image.height, rows.tobytes())
+
+# endregion
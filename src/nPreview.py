@@ -0,0 +1,330 @@
+# region Imports
+
+import bpy
+import os
+from collections import OrderedDict
+import numpy as np
+from . import nData
+from . import nProject
+
+# endregion
+
+# region Settings
+
+# custom property marking preview images that were created on demand and can be evicted
+lazy_preview_tag = "nuv_lazy_preview"
+
+# pages of lazily created previews by (collection name, page), most recently viewed last
+pages = OrderedDict()
+
+# previews waiting to be created by (collection name, page) and their rect indices
+pending = OrderedDict()
+
+# names of preview images waiting for their icon pixels
+pending_icons = set()
+
+# previews that couldn't be read from their project, by (collection name, preview name, content hash). a new
+# import changes the content hash of whatever it updates, so those previews are tried again.
+failed = set()
+
+# endregion
+
+# region Methods
+
+
+def request_preview(collection, rect_idx, page):
+    """Returns the preview image of a rect, queueing it to be created if it doesn't exist yet.
+
+    Blender doesn't allow creating images while drawing, so missing previews are created on a timer and the
+    sidebar redraws once they're ready.
+
+    Args:
+        collection (NeoTileRectCollection): The collection of the rect.
+        rect_idx (int): The index of the rect in the collection.
+        page: The page the rect is drawn on, rects on pages that haven't been viewed recently are evicted.
+
+    Returns:
+        bpy.types.Image: The preview image, or None if it isn't available yet.
+    """
+    rect = collection.get_items()[rect_idx]
+    page_key = (collection.name, page)
+
+    image = collection.get_image(rect.previewName)
+
+    if image is not None:
+        if image.get(lazy_preview_tag):
+            touch_page(page_key).add(image.name)
+
+        return image
+
+    if rect.previewLength <= 0 or is_failed(collection, rect):
+        return None
+
+    touch_page(page_key)
+    pending.setdefault(page_key, set()).add(rect_idx)
+
+    if not bpy.app.timers.is_registered(create_pending_previews):
+        bpy.app.timers.register(create_pending_previews)
+
+    return None
+
+
+def get_icon_id(image):
+    """Returns the icon of a preview image, queueing its icon pixels to be written if they haven't been.
+
+    Drawing never calls preview_ensure, which would queue a preview render for every visible rect on every redraw.
+
+    Returns:
+        int: The icon id, or None if the icon isn't available yet.
+    """
+    if image.get(nData.preview_icon_tag) and image.preview is not None:
+        return image.preview.icon_id
+
+    # linked images can't be written to, they come with their icons from the library
+    if image.library is not None:
+        return image.preview.icon_id if image.preview is not None else None
+
+    pending_icons.add(image.name)
+
+    if not bpy.app.timers.is_registered(create_pending_previews):
+        bpy.app.timers.register(create_pending_previews)
+
+    return None
+
+
+def is_failed(collection, rect):
+    """Returns whether the preview of a rect couldn't be read from its project file."""
+    if collection.is_linked():
+        return True
+
+    return (collection.name, rect.previewName, rect.contentHash) in failed
+
+
+def touch_page(page_key):
+    """Marks a page as recently viewed and returns the names of the previews created for it."""
+    names = pages.get(page_key)
+    if names is None:
+        names = pages[page_key] = set()
+    else:
+        pages.move_to_end(page_key)
+
+    return names
+
+
+def create_pending_previews():
+    """Creates the previews queued while drawing, then evicts the pages that haven't been viewed recently."""
+    collections = bpy.context.scene.nuv_uvSets
+
+    while pending:
+        (collection_name, page), indices = pending.popitem(last=False)
+        collection = collections.get(collection_name)
+        if collection is None:
+            continue
+
+        names = touch_page((collection_name, page))
+        names.update(create_previews(collection, sorted(indices)))
+
+    while pending_icons:
+        image = bpy.data.images.get(pending_icons.pop())
+        if image is not None and image.size[0] > 0:
+            nData.ImportRectData.set_preview_icon(image, nData.ImportRectData.get_image_pixels(image))
+
+    evict_pages(bpy.context.scene.nuv_settings.preview_page_count)
+
+    for area in bpy.context.screen.areas if bpy.context.screen else []:
+        if area.type == "VIEW_3D":
+            area.tag_redraw()
+
+    return None
+
+
+def create_previews(collection, indices, evictable=True):
+    """Reads the preview pngs of rects from the collections project file and adds them as images.
+
+    Previews whose data no longer matches the rect, because the project changed since it was imported, are
+    skipped until the next import.
+
+    Args:
+        collection (NeoTileRectCollection): The collection of the rects.
+        indices (list): The indices of the rects to create previews for.
+        evictable (bool): Whether the previews are removed again once their page hasn't been viewed recently.
+
+    Returns:
+        list: The names of the images that were created.
+    """
+    path = os.path.abspath(collection.relative_path)
+    settings = bpy.context.scene.nuv_settings
+    cache = nData.get_image_cache(settings) if settings.import_decode_previews else None
+    directory = nData.get_storage_directory(collection)
+    created = []
+
+    try:
+        f = open(path, "rb")
+    except OSError:
+        for i in indices:
+            if i < len(collection.items):
+                rect = collection.items[i]
+                failed.add((collection.name, rect.previewName, rect.contentHash))
+
+        return created
+
+    with f:
+        for i in indices:
+            if i >= len(collection.items):
+                continue
+
+            rect = collection.items[i]
+            if bpy.data.images.get(rect.previewName) is not None:
+                continue
+
+            f.seek(rect.previewOffset)
+            png = f.read(rect.previewLength)
+
+            if nProject.hash_rect(rect_verts(rect), png) != rect.contentHash:
+                failed.add((collection.name, rect.previewName, rect.contentHash))
+                continue
+
+            decoded = nData.ImportRectData.load_decoded(png, cache) if settings.import_decode_previews else None
+
+            image = nData.ImportRectData.add_image(png, rect.previewName, decoded, directory=directory)
+            if evictable:
+                image[lazy_preview_tag] = True
+
+            if decoded is not None:
+                nData.ImportRectData.set_preview_icon(image, decoded)
+            created.append(rect.previewName)
+
+    return created
+
+
+def rect_verts(rect):
+    """Returns the vertices of a rect in project file order, as they were hashed on import."""
+    return np.array((rect.topLeftX, rect.topLeftY, rect.topRightX, rect.topRightY,
+                     rect.bottomRightX, rect.bottomRightY, rect.bottomLeftX, rect.bottomLeftY), dtype=np.float32)
+
+
+def evict_pages(max_pages):
+    """Removes the lazily created previews of the least recently viewed pages, keeping max_pages pages."""
+    while len(pages) > max_pages:
+        _, names = pages.popitem(last=False)
+
+        # a preview can be shown on more than one page, for example in a pattern
+        retained = set()
+        for n in pages.values():
+            retained.update(n)
+
+        for name in names - retained:
+            image = bpy.data.images.get(name)
+            if image is not None and image.library is None and image.get(lazy_preview_tag):
+                bpy.data.images.remove(image)
+
+
+def reset():
+    pages.clear()
+    pending.clear()
+    pending_icons.clear()
+    failed.clear()
+
+
+@bpy.app.handlers.persistent
+def on_load_post(_):
+    reset()
+
+# endregion
+
+# region Operators
+
+
+class NeoTilePackImages(bpy.types.Operator):
+    bl_idname = "neo.uvset_pack_images"
+    bl_label = "Pack for Distribution"
+    bl_description = "Creates every preview and packs them and the atlas into the blend file, so it opens without the project file or image folder."
+    bl_options = {"REGISTER", "UNDO"}
+
+    collectionIdx: bpy.props.IntProperty()
+
+    def invoke(self, context, event):
+        collection = context.scene.nuv_uvSets[self.collectionIdx]
+        collection.storage_mode = "PACKED"
+
+        # lazy previews that were never viewed don't exist yet
+        create_previews(collection, range(len(collection.items)), evictable=False)
+
+        names = {"Atlas_" + collection.name}
+        names.update(r.previewName for r in collection.items)
+
+        packed = 0
+        packed_bytes = 0
+        missing = 0
+        missing_files = []
+
+        for name in names:
+            image = bpy.data.images.get(name)
+            if image is None:
+                missing += 1
+                continue
+
+            # packed previews have to stay around
+            if lazy_preview_tag in image:
+                del image[lazy_preview_tag]
+
+            if image.packed_file is None:
+                try:
+                    image.pack()
+                except RuntimeError:
+                    # the external file was deleted or moved
+                    missing_files.append(name)
+                    continue
+
+            packed += 1
+            packed_bytes += image.packed_file.size
+
+        # images that couldn't be packed are written again on the next reload
+        if not missing and not missing_files:
+            collection.image_storage = "PACKED"
+
+        collection.bump_generation()
+
+        self.report({"INFO"}, "Packed " + str(packed) + " images, " + str(round(packed_bytes / (1024 * 1024), 2)) +
+                    " MB in total.")
+
+        if missing:
+            self.report({"WARNING"}, str(missing) + " images couldn't be created, reload the tile map and try again.")
+
+        if missing_files:
+            self.report({"WARNING"}, "The files of " + str(len(missing_files)) + " images are missing, reload the "
+                        "tile map to pack them: " + ", ".join(sorted(missing_files)[:5]) +
+                        (", ..." if len(missing_files) > 5 else ""))
+
+        return {'FINISHED'}
+
+# endregion
+
+# region Blender
+
+
+classes = (
+    NeoTilePackImages,
+)
+
+
+def register():
+    for c in classes:
+        bpy.utils.register_class(c)
+
+    bpy.app.handlers.load_post.append(on_load_post)
+
+
+def unregister():
+    for c in classes:
+        bpy.utils.unregister_class(c)
+
+    if on_load_post in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(on_load_post)
+
+    if bpy.app.timers.is_registered(create_pending_previews):
+        bpy.app.timers.unregister(create_pending_previews)
+
+    reset()
+
+# endregion
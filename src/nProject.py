@@ -0,0 +1,689 @@
+# region Imports
+
+import hashlib
+import mmap
+import os
+import struct
+import zlib
+import numpy as np
+
+# endregion
+
+# region Settings
+
+project_id = "NEOPROJ"
+
+int32 = struct.Struct("<i")
+uint32 = struct.Struct("<I")
+int64 = struct.Struct("<q")
+
+# per rect header in the uvs chunk, followed by png_len bytes of preview png data
+# vertices are stored as top left, top right, bottom right and bottom left x/y pairs
+rect_header_dtype = np.dtype([
+    ("verts", "<f4", (8,)),
+    ("png_len", "<i4"),
+])
+
+rect_verts_size = rect_header_dtype.fields["png_len"][1]
+
+# rect vertices are quantized to this many steps per unit when used as keys
+key_precision = 1000000
+
+# chunks whose name ends with this are stored as their uncompressed length followed by a zlib stream of their data
+compressed_suffix = ".z"
+
+# compressed chunks are decompressed in blocks of this many bytes, in and out
+decompress_block_size = 256 * 1024
+
+# zlib can't expand data by more than about this much, anything claiming more is corrupt
+zlib_max_ratio = 1032
+
+# blender truncates the names of images and other data blocks to this many utf-8 bytes
+max_name_bytes = 63
+
+# preview image names use this many hex digits of the preview content hash
+preview_hash_digits = 16
+
+# tile map names too long for a preview name are cut short and followed by this many hex digits of a hash of the name
+name_hash_digits = 8
+
+# endregion
+
+# region Exceptions
+
+
+class ProjectFileError(Exception):
+    """Raised when a project file is not a valid or complete tile map project."""
+
+# endregion
+
+# region Chunk Types
+
+
+class ProjectFileContent:
+    """Contains the location of a chunk read from a neognosis project file.
+
+    The name of a compressed chunk doesn't include the compressed suffix, dataAddress and dataLen are always where its
+    stored data is in the file.
+    """
+
+    def __init__(self, view, offset):
+        file_len = len(view)
+
+        if offset + 1 > file_len:
+            raise ProjectFileError("Chunk header at " + str(offset) + " is truncated.")
+
+        name_len = view[offset]
+        name_end = offset + 1 + name_len
+
+        if name_end + int64.size > file_len:
+            raise ProjectFileError("Chunk header at " + str(offset) + " is truncated.")
+
+        self.name = bytes(view[offset + 1:name_end]).decode('utf-8')
+        self.dataLen = int64.unpack_from(view, name_end)[0]
+        self.dataAddress = name_end + int64.size
+        self.compressed = self.name.endswith(compressed_suffix)
+
+        if self.compressed:
+            self.name = self.name[:-len(compressed_suffix)]
+
+        if self.dataLen < 0 or self.dataAddress + self.dataLen > file_len:
+            raise ProjectFileError("Chunk \"" + self.name + "\" claims " + str(self.dataLen) +
+                                   " bytes, which runs past the end of the file.")
+
+
+class AtlasChunk:
+    """Contains the data of the atlas chunk. The png is a view into the project file."""
+
+    def __init__(self, tile_width, tile_height, png):
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.png = png
+
+
+class ProjectInfo:
+    """Contains the header and chunk table of a project file, read without touching any chunk data."""
+
+    def __init__(self, filepath, version, chunks):
+        self.filepath = filepath
+        self.version = version
+        self.chunks = chunks
+
+
+class UvChunk:
+    """Contains the data of the uvs chunk.
+
+    verts is a (count, 8) float32 array in file order: top left, top right, bottom right and bottom left.
+    previews holds one png view into the project file per rect, which starts at the matching preview_offsets entry
+    of the file and is preview_lengths bytes long. When the chunk is compressed the views and offsets are into the
+    decompressed chunk instead, so previews can't be read from the file on their own.
+    """
+
+    def __init__(self, verts, previews, preview_offsets, preview_lengths, compressed=False):
+        self.count = len(previews)
+        self.compressed = compressed
+        self.verts = verts
+        self.previews = previews
+        self.preview_offsets = preview_offsets
+        self.preview_lengths = preview_lengths
+        self.preview_hashes = None
+
+    def hash_previews(self):
+        """Returns the sha256 digest of each preview png, in rect order. They're only hashed the first time."""
+        if self.preview_hashes is None:
+            self.preview_hashes = [hashlib.sha256(p).digest() for p in self.previews]
+
+        return self.preview_hashes
+
+# endregion
+
+# region Reader
+
+
+class ProjectReader:
+    """Memory maps a neognosis project file and reads its chunks without copying them.
+
+    Any png views handed out by the reader are only valid until it's closed.
+    """
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.version = 0
+        self.chunks = []
+        self._exports = []
+        self._decompressed = {}
+
+        self._file = open(filepath, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ProjectFileError("The project file is empty.")
+
+        self._view = memoryview(self._map)
+        self.size = len(self._view)
+
+        try:
+            self._read_header()
+            self._read_chunk_table()
+        except Exception:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """Releases every view handed out by the reader and unmaps the file."""
+        if self._file is None:
+            return
+
+        for v in self._exports:
+            v.release()
+        self._exports.clear()
+
+        for v in self._decompressed.values():
+            v.release()
+        self._decompressed.clear()
+
+        self._view.release()
+        self._map.close()
+        self._file.close()
+        self._file = None
+
+    def hash_chunk(self, chunk):
+        """Returns the sha256 hex digest of a chunks data, as it's stored in the file."""
+        return hashlib.sha256(self._view[chunk.dataAddress:chunk.dataAddress + chunk.dataLen]).hexdigest()
+
+    def get_chunk(self, name):
+        """Returns the first chunk with the given name, or None if the project doesn't contain it."""
+        for c in self.chunks:
+            if c.name == name:
+                return c
+
+        return None
+
+    def read_atlas(self, chunk):
+        """Reads the atlas chunk.
+
+        Args:
+            chunk (ProjectFileContent): The atlas chunk.
+
+        Returns:
+            AtlasChunk: The tile dimensions and a view of the atlas png.
+        """
+        view, offset, end = self._get_data(chunk)
+
+        self._require(offset + 12, end, chunk.name)
+        tile_width = int32.unpack_from(view, offset)[0]
+        tile_height = int32.unpack_from(view, offset + 4)[0]
+        png_len = int32.unpack_from(view, offset + 8)[0]
+        offset += 12
+
+        if png_len < 0: raise ProjectFileError("The atlas has a negative png length.")
+        self._require(offset + png_len, end, chunk.name)
+
+        return AtlasChunk(tile_width, tile_height, self._slice(view, offset, png_len))
+
+    def read_uvs(self, chunk):
+        """Reads the uvs chunk. Rect headers are gathered and decoded in a single pass.
+
+        Args:
+            chunk (ProjectFileContent): The uvs chunk.
+
+        Returns:
+            UvChunk: The rect vertices and views of each rects preview png.
+        """
+        view, offset, end = self._get_data(chunk)
+        header_size = rect_header_dtype.itemsize
+
+        self._require(offset + 4, end, chunk.name)
+        rect_count = int32.unpack_from(view, offset)[0]
+        offset += 4
+
+        if rect_count < 0 or offset + rect_count * header_size > end:
+            raise ProjectFileError("The uvs chunk claims " + str(rect_count) + " rects but is only " +
+                                   str(end - offset + 4) + " bytes long.")
+
+        # walk the rect headers, only the png lengths are needed to find the next rect
+        header_offsets = np.empty(rect_count, dtype=np.int64)
+        previews = []
+
+        for i in range(rect_count):
+            self._require(offset + header_size, end, chunk.name)
+            png_len = int32.unpack_from(view, offset + rect_verts_size)[0]
+
+            if png_len < 0: raise ProjectFileError("Rect " + str(i) + " has a negative png length.")
+            self._require(offset + header_size + png_len, end, chunk.name)
+
+            header_offsets[i] = offset
+            previews.append(self._slice(view, offset + header_size, png_len))
+            offset += header_size + png_len
+
+        # decode every rect header at once through a structured view of the gathered bytes
+        raw = np.frombuffer(view, dtype=np.uint8)
+        gathered = raw[header_offsets[:, None] + np.arange(header_size)]
+        del raw
+
+        headers = gathered.view(rect_header_dtype).reshape(-1)
+        verts = np.ascontiguousarray(headers["verts"])
+        preview_lengths = headers["png_len"].astype(np.int64)
+
+        return UvChunk(verts, previews, header_offsets + header_size, preview_lengths, chunk.compressed)
+
+    def read_uvs_from_sidecar(self, sidecar):
+        """Reads the uvs chunk using the rect table of a valid sidecar, without walking the rect headers.
+
+        Args:
+            sidecar (ProjectSidecar): A sidecar that was checked to be valid for the project file.
+
+        Returns:
+            UvChunk: The rect vertices and views of each rects preview png.
+        """
+        chunk = self.get_chunk("uvs")
+        view = self._get_data(chunk)[0] if chunk is not None else self._view
+
+        offsets = sidecar.preview_offsets.tolist()
+        lengths = sidecar.preview_lengths.tolist()
+
+        if offsets and max(o + l for o, l in zip(offsets, lengths)) > len(view):
+            raise ProjectFileError("The sidecar doesn't match the project file.")
+
+        previews = [self._slice(view, o, l) for o, l in zip(offsets, lengths)]
+
+        uvs = UvChunk(sidecar.verts, previews, sidecar.preview_offsets, sidecar.preview_lengths,
+                      chunk is not None and chunk.compressed)
+        uvs.preview_hashes = sidecar.preview_hashes
+        return uvs
+
+    def _read_header(self):
+        view = self._view
+        file_len = len(view)
+
+        id_len = view[0]
+        if 1 + id_len + uint32.size > file_len:
+            raise ProjectFileError("The project header is truncated.")
+
+        id_name = bytes(view[1:1 + id_len]).decode("utf-8", errors="replace")
+        if id_name != project_id:
+            raise ProjectFileError("Not a neognosis project file.")
+
+        self.version = uint32.unpack_from(view, 1 + id_len)[0]
+        self._data_start = 1 + id_len + uint32.size
+
+    def _read_chunk_table(self):
+        offset = self._data_start
+        file_len = len(self._view)
+
+        while offset < file_len:
+            chunk = ProjectFileContent(self._view, offset)
+            self.chunks.append(chunk)
+            offset = chunk.dataAddress + chunk.dataLen
+
+    def _get_data(self, chunk):
+        """Returns the view holding the data of a chunk and where the data starts and ends in it."""
+        if not chunk.compressed:
+            return self._view, chunk.dataAddress, chunk.dataAddress + chunk.dataLen
+
+        view = self._decompressed.get(chunk.name)
+        if view is None:
+            view = self._decompressed[chunk.name] = memoryview(self._decompress(chunk))
+
+        return view, 0, len(view)
+
+    def _decompress(self, chunk):
+        """Decompresses a chunk into a buffer of its uncompressed length.
+
+        The compressed data is fed from the mapped file in blocks and the output is written straight into the
+        buffer, so the decompressed copy is the only one that's ever held in memory.
+        """
+        offset = chunk.dataAddress
+        end = chunk.dataAddress + chunk.dataLen
+
+        self._require(offset + int64.size, end, chunk.name)
+        size = int64.unpack_from(self._view, offset)[0]
+        offset += int64.size
+
+        if size < 0 or size > (end - offset) * zlib_max_ratio + decompress_block_size:
+            raise ProjectFileError("The \"" + chunk.name + "\" chunk claims an uncompressed length of " + str(size) +
+                                   " bytes, which its compressed data can't hold.")
+
+        buffer = bytearray(size)
+        written = 0
+        decompressor = zlib.decompressobj()
+        overflow = False
+
+        try:
+            while offset < end and not decompressor.eof:
+                # the block is released before anything raises, a view left in the traceback would keep the file
+                # from being unmapped when the reader is closed
+                with self._view[offset:min(offset + decompress_block_size, end)] as block:
+                    offset += len(block)
+                    data = block
+
+                    while data and not decompressor.eof:
+                        out = decompressor.decompress(data, decompress_block_size)
+                        data = decompressor.unconsumed_tail
+
+                        if written + len(out) > size:
+                            overflow = True
+                            break
+
+                        buffer[written:written + len(out)] = out
+                        written += len(out)
+
+                if overflow:
+                    raise ProjectFileError("The \"" + chunk.name + "\" chunk is longer than it claims.")
+
+            # anything zlib held back once the output block was full
+            out = decompressor.flush()
+            if written + len(out) > size:
+                raise ProjectFileError("The \"" + chunk.name + "\" chunk is longer than it claims.")
+
+            buffer[written:written + len(out)] = out
+            written += len(out)
+        except zlib.error as e:
+            raise ProjectFileError("The \"" + chunk.name + "\" chunk can't be decompressed: " + str(e))
+
+        if not decompressor.eof or written != size:
+            raise ProjectFileError("The \"" + chunk.name + "\" chunk is truncated.")
+
+        return buffer
+
+    def _slice(self, view, offset, length):
+        v = view[offset:offset + length]
+        self._exports.append(v)
+        return v
+
+    @staticmethod
+    def _require(needed_end, chunk_end, name):
+        if needed_end > chunk_end:
+            raise ProjectFileError("The \"" + name + "\" chunk is truncated.")
+
+# endregion
+
+# region Sidecar
+
+
+sidecar_magic = b"NTPS"
+sidecar_version = 1
+
+# magic, format version, source mtime in ns, source size, project version, chunk count, rect count
+sidecar_header = struct.Struct("<4sIqqIII")
+
+# name length and name precede each chunk entry
+sidecar_chunk = struct.Struct("<qq32s")
+
+
+class ProjectSidecar:
+    """A compact, already parsed copy of a project file, stamped with the modification time and size of the source.
+
+    Holds the chunk table with content hashes and the rect vertices, preview locations and preview hashes, so an
+    unchanged project can be checked or indexed without reading the source file.
+    """
+
+    def __init__(self, mtime_ns, size, version, chunks, verts, preview_offsets, preview_lengths, preview_hashes):
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.version = version
+        self.chunks = chunks
+        self.verts = verts
+        self.preview_offsets = preview_offsets
+        self.preview_lengths = preview_lengths
+        self.preview_hashes = preview_hashes
+
+    @staticmethod
+    def from_project(filepath, version, chunks, chunk_hashes, uvs):
+        """Creates a sidecar for a parsed project file.
+
+        Args:
+            filepath (str): The path of the project file, used for its stamp.
+            version (int): The project version.
+            chunks (list): The ProjectFileContent of each chunk.
+            chunk_hashes (dict): The sha256 hex digest of each chunk by name.
+            uvs (UvChunk): The parsed uvs chunk, or None if the project doesn't have one.
+        """
+        stat = os.stat(filepath)
+        entries = [(c.name, c.dataAddress, c.dataLen, chunk_hashes.get(c.name, "")) for c in chunks]
+
+        if uvs is None:
+            return ProjectSidecar(stat.st_mtime_ns, stat.st_size, version, entries,
+                                  np.empty((0, 8), dtype=np.float32), np.empty(0, dtype=np.int64),
+                                  np.empty(0, dtype=np.int64), [])
+
+        return ProjectSidecar(stat.st_mtime_ns, stat.st_size, version, entries, uvs.verts,
+                              uvs.preview_offsets, uvs.preview_lengths, uvs.hash_previews())
+
+    def is_valid_for(self, filepath):
+        """Returns whether the sidecar still matches the project file, going by its modification time and size."""
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return False
+
+        return stat.st_mtime_ns == self.mtime_ns and stat.st_size == self.size
+
+    def get_chunk_hash(self, name):
+        for c in self.chunks:
+            if c[0] == name:
+                return c[3]
+
+        return ""
+
+    def write(self, path):
+        count = len(self.verts)
+        parts = [sidecar_header.pack(sidecar_magic, sidecar_version, self.mtime_ns, self.size, self.version,
+                                     len(self.chunks), count)]
+
+        for name, offset, length, content_hash in self.chunks:
+            name_bytes = name.encode("utf-8")
+            parts.append(bytes([len(name_bytes)]) + name_bytes)
+            parts.append(sidecar_chunk.pack(offset, length, bytes.fromhex(content_hash) if content_hash else b""))
+
+        parts.append(np.ascontiguousarray(self.verts, dtype="<f4").tobytes())
+        parts.append(np.ascontiguousarray(self.preview_offsets, dtype="<i8").tobytes())
+        parts.append(np.ascontiguousarray(self.preview_lengths, dtype="<i8").tobytes())
+        parts.append(b"".join(self.preview_hashes))
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(b"".join(parts))
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def read(path, header_only=False):
+        """Reads a sidecar file.
+
+        Args:
+            path (str): The path of the sidecar.
+            header_only (bool): Whether to skip reading the rect data.
+
+        Returns:
+            ProjectSidecar: The sidecar, or None if it doesn't exist or is from a different format version.
+        """
+        try:
+            with open(path, "rb") as f:
+                head = f.read(sidecar_header.size)
+                if len(head) < sidecar_header.size:
+                    return None
+
+                magic, version, mtime_ns, size, project_version, chunk_count, count = sidecar_header.unpack(head)
+                if magic != sidecar_magic or version != sidecar_version:
+                    return None
+
+                chunks = []
+                for _ in range(chunk_count):
+                    name_len = f.read(1)
+                    if not name_len:
+                        return None
+
+                    name = f.read(name_len[0]).decode("utf-8")
+                    entry = f.read(sidecar_chunk.size)
+                    if len(entry) < sidecar_chunk.size:
+                        return None
+
+                    offset, length, digest = sidecar_chunk.unpack(entry)
+                    chunks.append((name, offset, length, digest.hex() if digest.strip(b"\0") else ""))
+
+                if header_only:
+                    return ProjectSidecar(mtime_ns, size, project_version, chunks, None, None, None, None)
+
+                body = f.read()
+        except OSError:
+            return None
+
+        if len(body) != count * (32 + 8 + 8 + 32):
+            return None
+
+        verts = np.frombuffer(body, dtype="<f4", count=count * 8).reshape(count, 8)
+        offset = count * 32
+        preview_offsets = np.frombuffer(body, dtype="<i8", count=count, offset=offset)
+        offset += count * 8
+        preview_lengths = np.frombuffer(body, dtype="<i8", count=count, offset=offset)
+        offset += count * 8
+        preview_hashes = [body[offset + i * 32:offset + i * 32 + 32] for i in range(count)]
+
+        return ProjectSidecar(mtime_ns, size, project_version, chunks, verts, preview_offsets, preview_lengths,
+                              preview_hashes)
+
+# endregion
+
+# region Writer
+
+
+def pack_chunk(name, data, compress=False):
+    """Returns a chunk with its header, ready to be written after the project header.
+
+    Args:
+        name (str): The name of the chunk.
+        data (bytes): The data of the chunk.
+        compress (bool): Whether to store the chunk compressed.
+    """
+    if compress:
+        name += compressed_suffix
+        data = int64.pack(len(data)) + zlib.compress(data, 9)
+
+    name_bytes = name.encode("utf-8")
+    return bytes([len(name_bytes)]) + name_bytes + int64.pack(len(data)) + data
+
+
+def pack_atlas(tile_width, tile_height, png):
+    """Returns the data of an atlas chunk."""
+    return int32.pack(tile_width) + int32.pack(tile_height) + int32.pack(len(png)) + bytes(png)
+
+
+def pack_uvs(verts, previews):
+    """Returns the data of a uvs chunk.
+
+    Args:
+        verts (numpy.ndarray): A (count, 8) array of rect vertices in file order.
+        previews (list): The preview png data of each rect.
+    """
+    verts = np.asarray(verts, dtype="<f4").reshape(-1, rect_verts_size // 4)
+    parts = [int32.pack(len(previews))]
+
+    for v, png in zip(verts, previews):
+        parts.append(v.tobytes())
+        parts.append(int32.pack(len(png)))
+        parts.append(bytes(png))
+
+    return b"".join(parts)
+
+
+def write_project(filepath, version, chunks, compressed=()):
+    """Writes a project file.
+
+    Args:
+        filepath (str): The path to write the project to.
+        version (int): The project version to write in the header.
+        chunks (list): (name, data) tuples of the chunks to write, in order.
+        compressed (set): The names of the chunks to store compressed.
+    """
+    id_bytes = project_id.encode("utf-8")
+
+    with open(filepath, "wb") as f:
+        f.write(bytes([len(id_bytes)]) + id_bytes + uint32.pack(version))
+
+        for name, data in chunks:
+            f.write(pack_chunk(name, data, name in compressed))
+
+# endregion
+
+# region Project Methods
+
+
+def inspect(filepath):
+    """Validates the header of a project file and reads its chunk table without reading any chunk data.
+
+    Args:
+        filepath (str): The path of the project file.
+
+    Returns:
+        ProjectInfo: The version and chunk table of the project.
+    """
+    with ProjectReader(filepath) as reader:
+        return ProjectInfo(filepath, reader.version, reader.chunks)
+
+# endregion
+
+# region Rect Methods
+
+
+def rect_key(verts):
+    """Returns a hashable key for a rect from its 8 vertex components, quantized so float noise still matches."""
+    return tuple(round(v * key_precision) for v in verts)
+
+
+def rect_id(verts):
+    """Returns the stable id of a rect, a short hex digest of its rect key that stays the same however the rects of a
+    collection are ordered."""
+    return hashlib.blake2b(struct.pack("<8q", *rect_key(verts)), digest_size=8).hexdigest()
+
+
+def rect_ids(verts):
+    """Returns the rect_id of every rect in a (count, 8) array of vertices in file order."""
+    keys = np.round(np.asarray(verts, dtype=np.float64) * key_precision).astype("<i8").tobytes()
+    size = 8 * 8
+
+    return [hashlib.blake2b(keys[i:i + size], digest_size=8).hexdigest() for i in range(0, len(keys), size)]
+
+
+def hash_rect(verts, png):
+    """Returns a content hash of a rects vertices and preview png.
+
+    Args:
+        verts (numpy.ndarray): The 8 float32 vertex components of the rect, in file order.
+        png (bytes): The preview png data of the rect.
+
+    Returns:
+        str: The hex digest of the rect content.
+    """
+    h = hashlib.sha256(np.ascontiguousarray(verts, dtype="<f4").tobytes())
+    h.update(png)
+    return h.hexdigest()
+
+
+def preview_image_name(tile_map_name, preview_hash):
+    """Returns the name of the shared preview image of a tile map for previews with the given content hash.
+
+    The name always fits in max_name_bytes, so Blender never truncates it and makes the names of different previews
+    collide. Tile map names that are too long are cut short and followed by a hash of the whole name, so tile maps
+    starting with the same name still get their own previews.
+    """
+    prefix = ".Atlas_"
+    suffix = "_Preview_" + preview_hash[:preview_hash_digits]
+    encoded = tile_map_name.encode("utf-8")
+
+    budget = max_name_bytes - len(prefix) - len(suffix)
+    if len(encoded) > budget:
+        tag = "~" + hashlib.sha1(encoded).hexdigest()[:name_hash_digits]
+        tile_map_name = encoded[:budget - len(tag)].decode("utf-8", "ignore") + tag
+
+    return prefix + tile_map_name + suffix
+
+# endregion
@@ -0,0 +1,140 @@
+# region Imports
+
+import math
+import numpy as np
+
+# endregion
+
+# region Settings
+
+# the most grid cells per rect, so a few tiny rects spread over a large area don't allocate a huge grid
+max_cells_per_rect = 4
+
+# endregion
+
+# region Grid
+
+
+class RectGrid:
+    """A uniform grid over the bounds of a set of rects, for finding the rect at a uv position by only testing the
+    rects overlapping its cell.
+
+    Cells are the size of the median rect, which is the tile size for atlases of evenly sized tiles, so most cells
+    hold a single rect.
+
+    Args:
+        uvs (numpy.ndarray): A (count, 8) array of rect vertices in file order, in uv space.
+        bounds (numpy.ndarray): A (count, 4) array of the min x, min y, max x and max y of each rect.
+    """
+
+    def __init__(self, uvs, bounds):
+        self.uvs = uvs
+        count = len(uvs)
+
+        if count == 0:
+            self.origin = (0.0, 0.0)
+            self.cell_size = (1.0, 1.0)
+            self.cells_x = self.cells_y = 1
+            self.cell_starts = np.zeros(2, dtype=np.int64)
+            self.cell_rects = np.zeros(0, dtype=np.int64)
+            return
+
+        origin = bounds[:, :2].min(axis=0)
+        extent = bounds[:, 2:].max(axis=0) - origin
+        cell_size = np.median(bounds[:, 2:] - bounds[:, :2], axis=0)
+
+        # degenerate rects or sets of rects get a single cell along that axis
+        cell_size = np.where(cell_size > 0.0, cell_size, np.maximum(extent, 1.0))
+        cells = np.maximum(np.ceil(extent / cell_size), 1.0)
+
+        scale = cells[0] * cells[1] / (count * max_cells_per_rect)
+        if scale > 1.0:
+            cell_size *= math.sqrt(scale)
+            cells = np.maximum(np.ceil(extent / cell_size), 1.0)
+
+        self.origin = (float(origin[0]), float(origin[1]))
+        self.cell_size = (float(cell_size[0]), float(cell_size[1]))
+        self.cells_x = int(cells[0])
+        self.cells_y = int(cells[1])
+
+        # the range of cells each rect overlaps
+        min_x, min_y = self.get_cell_coords(bounds[:, 0], bounds[:, 1])
+        max_x, max_y = self.get_cell_coords(bounds[:, 2], bounds[:, 3])
+        width = max_x - min_x + 1
+        counts = width * (max_y - min_y + 1)
+
+        # one entry per overlapped cell, sorted by cell and then by rect so the first hit in a cell is the first rect
+        rects = np.repeat(np.arange(count, dtype=np.int64), counts)
+        n = np.arange(len(rects), dtype=np.int64) - np.repeat(np.cumsum(counts) - counts, counts)
+        cell_x = min_x[rects] + n % width[rects]
+        cell_y = min_y[rects] + n // width[rects]
+        entry_cells = cell_y * self.cells_x + cell_x
+
+        order = np.argsort(entry_cells, kind="stable")
+        self.cell_rects = rects[order]
+
+        cell_count = self.cells_x * self.cells_y
+        self.cell_starts = np.zeros(cell_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(entry_cells, minlength=cell_count), out=self.cell_starts[1:])
+
+    def get_cell_coords(self, x, y):
+        """Returns the cell column and row of positions as arrays, clamped to the grid."""
+        cell_x = np.floor((np.asarray(x, dtype=np.float64) - self.origin[0]) / self.cell_size[0])
+        cell_y = np.floor((np.asarray(y, dtype=np.float64) - self.origin[1]) / self.cell_size[1])
+
+        return (np.clip(cell_x, 0, self.cells_x - 1).astype(np.int64),
+                np.clip(cell_y, 0, self.cells_y - 1).astype(np.int64))
+
+    def get_cell(self, x, y):
+        """Returns the cell index of a position, clamped to the grid."""
+        cell_x = min(max(math.floor((x - self.origin[0]) / self.cell_size[0]), 0), self.cells_x - 1)
+        cell_y = min(max(math.floor((y - self.origin[1]) / self.cell_size[1]), 0), self.cells_y - 1)
+
+        return cell_y * self.cells_x + cell_x
+
+    def find(self, x, y):
+        """Returns the index of the first rect containing a uv position, or -1 if none do."""
+        cell = self.get_cell(x, y)
+        candidates = self.cell_rects[self.cell_starts[cell]:self.cell_starts[cell + 1]]
+
+        u = self.uvs[candidates]
+        hits = np.flatnonzero((u[:, 0] < x) & (x < u[:, 2]) & (u[:, 7] < y) & (y < u[:, 1]))
+
+        return int(candidates[hits[0]]) if len(hits) else -1
+
+    def find_many(self, xs, ys):
+        """Returns the index of the first rect containing each of a list of uv positions, or -1 where none do.
+
+        Args:
+            xs (numpy.ndarray): The x of each position.
+            ys (numpy.ndarray): The y of each position.
+
+        Returns:
+            numpy.ndarray: An int64 array of rect indices.
+        """
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        count = len(self.uvs)
+
+        cell_x, cell_y = self.get_cell_coords(xs, ys)
+        cells = cell_y * self.cells_x + cell_x
+        starts = self.cell_starts[cells]
+        counts = self.cell_starts[cells + 1] - starts
+
+        # every position paired with every rect in its cell
+        points = np.repeat(np.arange(len(xs), dtype=np.int64), counts)
+        n = np.arange(len(points), dtype=np.int64) - np.repeat(np.cumsum(counts) - counts, counts)
+        rects = self.cell_rects[np.repeat(starts, counts) + n]
+
+        u = self.uvs[rects]
+        x = xs[points]
+        y = ys[points]
+        inside = (u[:, 0] < x) & (x < u[:, 2]) & (u[:, 7] < y) & (y < u[:, 1])
+
+        result = np.full(len(xs), count, dtype=np.int64)
+        np.minimum.at(result, points[inside], rects[inside])
+        result[result == count] = -1
+
+        return result
+
+# endregion
@@ -1,10 +1,11 @@
 # region Imports
 import bpy
 import gpu
+import numpy as np
 from . import nImageOp
 from . import nUtil
-from . import nData
 from . import nMath
+from . import nRectTable
 import mathutils
 
 is_blender_4_or_greater = bpy.app.version[0] > 3
@@ -39,7 +40,7 @@ class NeoRectSelector(nImageOp.NeoImageOperator):
         super().init()
         self.dragging = False
         self.finished = False
-        self.highlighted_Item = None
+        self.highlighted_idx = -1
 
     def on_open(self, context, event):
         self.collection = bpy.context.scene.nuv_uvSets[self.collectionIdx]
@@ -47,11 +48,11 @@ class NeoRectSelector(nImageOp.NeoImageOperator):
         img_name = f"Atlas_{self.collection.name}"
 
         if is_blender_4_or_greater:
-            image = gpu.texture.from_image(bpy.data.images[img_name])
+            image = gpu.texture.from_image(self.collection.get_image(img_name))
         else:
-            image = bpy.data.images[img_name]
+            image = self.collection.get_image(img_name)
 
-        args = (self, image, self.collection.items, context)
+        args = (self, image, context)
         self.handle = bpy.types.SpaceView3D.draw_handler_add(self.draw_tool, args, 'WINDOW', 'POST_PIXEL')
         self.zoom = 0.85  # NEW: Make sure the image is framed nicely
 
@@ -76,19 +77,13 @@ class NeoRectSelector(nImageOp.NeoImageOperator):
 
     def on_mouse_down(self, context, btn_idx):
         if btn_idx == 0:
-            if self.highlighted_Item is None:
+            if self.highlighted_idx < 0:
                 return
             else:
                 self.finished = True
 
-                idx = -1
-                for item in self.collection.items:
-                    idx += 1
-                    if self.highlighted_Item.__eq__(item):
-                        break
-
                 try:
-                    self.on_rect_selected(self.collectionIdx, idx)
+                    self.on_rect_selected(self.collectionIdx, self.highlighted_idx)
                 except Exception as e:
                     print(e)
 
@@ -132,17 +127,12 @@ class NeoRectSelector(nImageOp.NeoImageOperator):
         self.img_data = nUtil.get_transformed_image_data(atlas, context.area.width, context.area.height,
                                                          self.zoom, self.offset_x, self.offset_y)
 
-        rect = self.collection.items.items()[rect_idx][1]
+        corners = nRectTable.get_table(self.collection).corners[rect_idx].reshape(4, 2)
 
         center = self.get_center()
         size = self.get_size()
 
-        top_left = center + mathutils.Vector(nData.rect_top_left(rect)) * size
-        top_right = center + mathutils.Vector(nData.rect_top_right(rect)) * size
-        bottom_right = center + mathutils.Vector(nData.rect_bottom_right(rect)) * size
-        bottom_left = center + mathutils.Vector(nData.rect_bottom_left(rect)) * size
-
-        mouse_center = (top_left + top_right + bottom_left + bottom_right) / 4
+        mouse_center = center + mathutils.Vector(corners.mean(axis=0).tolist()) * size
 
         region_x = context.area.x + mouse_center.x
         region_y = context.area.y + mouse_center.y
@@ -155,7 +145,7 @@ class NeoRectSelector(nImageOp.NeoImageOperator):
         return mathutils.Vector((self.img_data[1], self.img_data[2])) * 0.5
 
     @staticmethod
-    def draw_tool(self, atlas, items, context):
+    def draw_tool(self, atlas, context):
         self.img_data = nUtil.get_transformed_image_data(atlas, context.area.width, context.area.height,
                                                          self.zoom, self.offset_x, self.offset_y)
 
@@ -186,44 +176,39 @@ class NeoRectSelector(nImageOp.NeoImageOperator):
             bpy.context.window.cursor_modal_set("DEFAULT")
 
         if hasattr(self, "collection"):
-            self.highlighted_Item = None
+            table = nRectTable.get_table(self.collection)
+
+            # the top left, top right, bottom right and bottom left corner of every rect on screen
+            screen = table.corners.reshape(-1, 4, 2).astype(np.float64) * tuple(size) + tuple(center)
+
+            self.highlighted_idx = -1
+            if not self.dragging:
+                mouse_x = self.mouse_region_x
+                mouse_y = self.mouse_region_y
 
-            has_highlight = False
-            highlight_top_left = None
-            highlight_top_right = None
-            highlight_bottom_Right = None
-            highlight_bottom_left = None
+                hits = np.flatnonzero((screen[:, 0, 0] < mouse_x) & (mouse_x < screen[:, 1, 0])
+                                      & (screen[:, 3, 1] < mouse_y) & (mouse_y < screen[:, 0, 1]))
+                if len(hits):
+                    self.highlighted_idx = int(hits[0])
+
+            # the start and end of every edge, drawn in one batch per color
+            lines = np.stack((screen, np.roll(screen, -1, axis=1)), axis=2).astype(np.float32)
 
             # draw items
-            for item in self.collection.items:
-                top_left = center + mathutils.Vector(nData.rect_top_left(item)) * size
-                top_right = center + mathutils.Vector(nData.rect_top_right(item)) * size
-                bottom_right = center + mathutils.Vector(nData.rect_bottom_right(item)) * size
-                bottom_left = center + mathutils.Vector(nData.rect_bottom_left(item)) * size
-
-                mouse_in_bounds = nUtil.mouse_in_bounds(self.mouse_region_x, self.mouse_region_y, top_left, top_right, bottom_right, bottom_left)
-                if mouse_in_bounds and not has_highlight and not self.dragging:
-                    self.highlighted_Item = item
-
-                    has_highlight = True
-                    highlight_top_left = top_left
-                    highlight_top_right = top_right
-                    highlight_bottom_Right = bottom_right
-                    highlight_bottom_left = bottom_left
-                else:
-                    nUtil.line_draw(top_left, top_right, lineColor)
-                    nUtil.line_draw(top_right, bottom_right, lineColor)
-                    nUtil.line_draw(bottom_right, bottom_left, lineColor)
-                    nUtil.line_draw(bottom_left, top_left, lineColor)
+            if self.highlighted_idx > -1:
+                highlight = lines[self.highlighted_idx].reshape(-1, 2)
+                lines = np.delete(lines, self.highlighted_idx, axis=0)
+            else:
+                highlight = None
+
+            if len(lines):
+                nUtil.lines_draw(lines.reshape(-1, 2), lineColor)
 
             # draw highlighted item
-            if has_highlight and not self.dragging:
-                nUtil.line_draw(highlight_top_left, highlight_top_right, highlightColor)
-                nUtil.line_draw(highlight_top_right, highlight_bottom_Right, highlightColor)
-                nUtil.line_draw(highlight_bottom_Right, highlight_bottom_left, highlightColor)
-                nUtil.line_draw(highlight_bottom_left, highlight_top_left, highlightColor)
+            if highlight is not None:
+                nUtil.lines_draw(highlight, highlightColor)
         else:
-            self.highlighted_Item = None
+            self.highlighted_idx = -1
 
 
 class NeoSetUvRectSelector(NeoRectSelector):
@@ -0,0 +1,125 @@
+# region Imports
+
+import numpy as np
+from . import nCache
+from . import nProject
+from . import nRectGrid
+
+# endregion
+
+# region Settings
+
+# the rect properties in file order, top left, top right, bottom right and bottom left x/y pairs
+corner_properties = ("topLeftX", "topLeftY", "topRightX", "topRightY",
+                     "bottomRightX", "bottomRightY", "bottomLeftX", "bottomLeftY")
+
+# the corners of the whole uv space as top left, top right, bottom right and bottom left, for unwrapping without a rect
+unit_uvs = ((0.0, 1.0), (1.0, 1.0), (1.0, 0.0), (0.0, 0.0))
+
+# compiled tables by collection key
+tables = nCache.register_cache({})
+
+
+class RectTable:
+    """A read only copy of the rects of a collection, so code running per face or per redraw doesn't read them through
+    RNA. It's compiled from the collection when it's first needed after the collection changed.
+
+    Attributes:
+        generation (int): The generation of the collection the table was compiled at.
+        corners (numpy.ndarray): A (count, 8) float32 array of rect vertices in file order, from -1 to 1.
+        uvs (numpy.ndarray): A (count, 8) array of the same vertices in 0 to 1 uv space.
+        bounds (numpy.ndarray): A (count, 4) array of the min x, min y, max x and max y uv of each rect.
+        grid (RectGrid): The spatial index of the rects, built when the table is first searched.
+        ids (list): The nProject.rect_id of each rect, computed when they're first needed.
+        id_index (dict): The index of the first rect with each id, computed when it's first needed.
+    """
+
+    def __init__(self, corners, generation):
+        self.generation = generation
+        self.corners = corners
+
+        # in double precision, so lookups agree with converting the rect properties in python
+        self.uvs = (corners.astype(np.float64) + 1.0) / 2.0
+
+        xs = self.uvs[:, 0::2]
+        ys = self.uvs[:, 1::2]
+        self.bounds = np.stack((xs.min(axis=1), ys.min(axis=1), xs.max(axis=1), ys.max(axis=1)), axis=1)
+
+        self.grid = None
+        self.ids = None
+        self.id_index = None
+
+    def __len__(self):
+        return len(self.corners)
+
+    def get_uvs(self, rect_idx):
+        """Returns the corners of a rect in uv space as top left, top right, bottom right and bottom left tuples."""
+        u = self.uvs[rect_idx].tolist()
+        return (u[0], u[1]), (u[2], u[3]), (u[4], u[5]), (u[6], u[7])
+
+    def get_grid(self):
+        if self.grid is None:
+            self.grid = nRectGrid.RectGrid(self.uvs, self.bounds)
+
+        return self.grid
+
+    def get_ids(self):
+        if self.ids is None:
+            self.ids = nProject.rect_ids(self.corners)
+
+        return self.ids
+
+    def get_id_index(self):
+        """Returns the index of the first rect with each rect id, for resolving pattern entries."""
+        if self.id_index is None:
+            self.id_index = {}
+            for i, rect_id in enumerate(self.get_ids()):
+                self.id_index.setdefault(rect_id, i)
+
+        return self.id_index
+
+    def find(self, x, y):
+        """Returns the index of the first rect containing a uv position, or -1 if none do. Matches
+        nData.rect_contains."""
+        return self.get_grid().find(x, y)
+
+    def find_many(self, xs, ys):
+        """Returns the index of the first rect containing each of a list of uv positions as an array, with -1 where
+        none do."""
+        return self.get_grid().find_many(xs, ys)
+
+# endregion
+
+# region Methods
+
+
+def get_table(collection):
+    """Returns the compiled rect table of a collection, compiling it again if the collection changed since.
+
+    Args:
+        collection (NeoTileRectCollection): The collection, its library collection is read when it's linked.
+    """
+    source = collection.get_source()
+    items = source.items
+    key = nCache.get_key(source)
+
+    table = tables.get(key)
+    if table is None or table.generation != source.generation or len(table) != len(items):
+        table = tables[key] = compile_table(items, source.generation)
+
+    return table
+
+
+def compile_table(items, generation):
+    """Reads the corners of every rect with one foreach_get per property."""
+    count = len(items)
+    corners = np.empty((count, 8), dtype=np.float32)
+    column = np.empty(count, dtype=np.float32)
+
+    for i, name in enumerate(corner_properties):
+        items.foreach_get(name, column)
+        corners[:, i] = column
+
+    return RectTable(corners, generation)
+
+# endregion
@@ -147,18 +147,22 @@ def draw_transformed_image(image, bottom_left, bottom_right, top_left, top_right
 
 
 def line_draw(pos_a, pos_b, color):
+    lines_draw((pos_a, pos_b), color)
+
+
+def lines_draw(coords, color):
+    """Draws lines between each pair of positions in coords in one batch."""
     if is_blender_4_or_greater:
-        line_draw_blender_4(pos_a, pos_b, color)
+        lines_draw_blender_4(coords, color)
     else:
-        line_draw_blender_3(pos_a, pos_b, color)
+        lines_draw_blender_3(coords, color)
 
 
-def line_draw_blender_4(pos_a, pos_b, color):
-    line = (pos_a, pos_b)
+def lines_draw_blender_4(coords, color):
     gpu.state.blend_set("ALPHA")
     gpu.state.line_width_set(2.0)
 
-    batch = batch_for_shader(shader_color, 'LINES', {"pos": line})
+    batch = batch_for_shader(shader_color, 'LINES', {"pos": coords})
     shader_color.bind()
     shader_color.uniform_float("color", color)
     batch.draw(shader_color)
@@ -167,12 +171,11 @@ def line_draw_blender_4(pos_a, pos_b, color):
     gpu.state.line_width_set(1.0)
 
 
-def line_draw_blender_3(pos_a, pos_b, color):
+def lines_draw_blender_3(coords, color):
     bgl.glEnable(bgl.GL_BLEND)
     bgl.glLineWidth(2)
 
-    line = (pos_a, pos_b)
-    batch = batch_for_shader(shader_color, 'LINES', {"pos": line})
+    batch = batch_for_shader(shader_color, 'LINES', {"pos": coords})
     shader_color.bind()
     shader_color.uniform_float("color", color)
     batch.draw(shader_color)
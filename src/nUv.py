@@ -9,6 +9,8 @@ from . import nMath
 from . import nInterface
 from . import nUtil
 from . import nData
+from . import nProject
+from . import nRectTable
 
 # endregion
 
@@ -30,6 +32,7 @@ def paint_post_unwrap(event, face, uv_layer):
 
 
 def get_best_rect_for_face(face, uv_layer, collection):
+    """Returns the index of the first rect of the collection containing the uv center of a face, or -1 if none do."""
 
     # calculate center
     uv_center = mathutils.Vector((0.0, 0.0))
@@ -43,13 +46,7 @@ def get_best_rect_for_face(face, uv_layer, collection):
     uv_center /= itr
 
     # check rect bounds
-    idx = -1
-    for rect in collection.items:
-        idx += 1
-        if nData.rect_contains(rect, uv_center.x, uv_center.y):
-            return rect, idx
-
-    return None
+    return nRectTable.get_table(collection).find(uv_center.x, uv_center.y)
 
 
 def rotate(only_selected, faces, clockwise, uv_layer):
@@ -236,22 +233,29 @@ def flip(only_selected, faces, horizontal, uv_layer):
                     uv.y = uv_center.y + -offset_y
 
 
-def unwrap_auto(space_mode, only_selected, context, mw, faces, unwrap_mode, correct_aspect, snap_mode, rect,
+def unwrap_auto(space_mode, only_selected, context, mw, faces, unwrap_mode, correct_aspect, snap_mode, rect_uvs,
                 uv_layer):
-    """Unwraps selected faces, automatically choosen between local of world unwrap based on the value of space_mode"""
+    """Unwraps selected faces, automatically choosen between local of world unwrap based on the value of space_mode.
+
+    rect_uvs are the top left, top right, bottom right and bottom left corners of the rect in uv space, from
+    RectTable.get_uvs.
+    """
     if space_mode == "perface":
-        unwrap_local(only_selected, context, mw, faces, unwrap_mode, correct_aspect, snap_mode, rect, uv_layer)
+        unwrap_local(only_selected, context, mw, faces, unwrap_mode, correct_aspect, snap_mode, rect_uvs, uv_layer)
     else:
-        unwrap_global(only_selected, context, mw, faces, unwrap_mode, correct_aspect, snap_mode, rect, uv_layer)
+        unwrap_global(only_selected, context, mw, faces, unwrap_mode, correct_aspect, snap_mode, rect_uvs, uv_layer)
 
 
-def unwrap_local(only_selected, context, mw, faces, unwrap_mode, correct_aspect, snap_mode, rect, uv_layer):
+def unwrap_local(only_selected, context, mw, faces, unwrap_mode, correct_aspect, snap_mode, rect_uvs, uv_layer):
     """
     Unwraps selected faces local to themselves.
     """
 
     normalize_to_bounds = snap_mode == "to_bounds"
 
+    top_left, top_right, bottom_right, bottom_left = rect_uvs
+    corners = [mathutils.Vector(c) for c in rect_uvs]
+
     # enumerate selected faces
     for face in faces:
         if not face.select and only_selected: continue
@@ -317,22 +321,7 @@ def unwrap_local(only_selected, context, mw, faces, unwrap_mode, correct_aspect,
         itr = 0
         for loop in face.loops:
             if unwrap_mode == "none" and vert_len <= 4:
-                if itr == 0:
-                    x = (rect.topLeftX + 1.0) / 2.0
-                    y = (rect.topLeftY + 1.0) / 2.0
-                    uv = mathutils.Vector((x, y))
-                elif itr == 1:
-                    x = (rect.topRightX + 1.0) / 2.0
-                    y = (rect.topRightY + 1.0) / 2.0
-                    uv = mathutils.Vector((x, y))
-                elif itr == 2:
-                    x = (rect.bottomRightX + 1.0) / 2.0
-                    y = (rect.bottomRightY + 1.0) / 2.0
-                    uv = mathutils.Vector((x, y))
-                elif itr == 3:
-                    x = (rect.bottomLeftX + 1.0) / 2.0
-                    y = (rect.bottomLeftY + 1.0) / 2.0
-                    uv = mathutils.Vector((x, y))
+                uv = corners[itr]
 
                 loop[uv_layer].uv = uv
             else:
@@ -341,19 +330,13 @@ def unwrap_local(only_selected, context, mw, faces, unwrap_mode, correct_aspect,
                 y = ((verts_local_face[itr].y / max_dim_y) + 1.0) / 2.0
 
                 # scale down to rect
-                top_left = nData.rect_top_left(rect)
-                top_right = nData.rect_top_right(rect)
-                bottom_left = nData.rect_bottom_left(rect)
-                bottom_right = nData.rect_bottom_right(rect)
-
-                x = nMath.lerp((top_left[0] + 1.0) / 2.0, (top_right[0] + 1.0) / 2.0, x, True)
-                y = nMath.lerp((bottom_left[1] + 1.0) / 2.0, (top_left[1] + 1.0) / 2.0, y, True)
+                x = nMath.lerp(top_left[0], top_right[0], x, True)
+                y = nMath.lerp(bottom_left[1], top_left[1], y, True)
 
                 uv = mathutils.Vector((x, y))
 
                 if snap_mode == "to_corners":
-                    uv = nUtil.find_closest_bound_vert(uv, mathutils.Vector(nUtil.abs_uv(top_left)), mathutils.Vector(nUtil.abs_uv(top_right)),
-                                                       mathutils.Vector(nUtil.abs_uv(bottom_right)), nUtil.abs_uv(mathutils.Vector(bottom_left)))
+                    uv = nUtil.find_closest_bound_vert(uv, *corners)
 
                 loop[uv_layer].uv = uv
 
@@ -385,17 +368,19 @@ def unwrap_local(only_selected, context, mw, faces, unwrap_mode, correct_aspect,
                     else:
                         factor_y *= aspect
 
-                uv.x = nMath.lerp((rect.topLeftX + 1.0) / 2.0, (rect.topRightX + 1.0) / 2.0, factor_x, True)
-                uv.y = nMath.lerp((rect.bottomLeftY + 1.0) / 2.0, (rect.topLeftY + 1.0) / 2.0, factor_y, True)
+                uv.x = nMath.lerp(top_left[0], top_right[0], factor_x, True)
+                uv.y = nMath.lerp(bottom_left[1], top_left[1], factor_y, True)
 
 
-def unwrap_global(only_selected, context, mw, faces, unwrap_mode, correct_aspect, snap_mode, rect, uv_layer):
+def unwrap_global(only_selected, context, mw, faces, unwrap_mode, correct_aspect, snap_mode, rect_uvs, uv_layer):
     """
     Unwraps the selected faces global to the sum of all faces
     """
 
     normalize_to_bounds = snap_mode != "off"
 
+    top_left, top_right, bottom_right, bottom_left = rect_uvs
+
     if normalize_to_bounds:
         bounds_init = 1000000000
         uv_bounds_min = mathutils.Vector((bounds_init, bounds_init))
@@ -504,12 +489,8 @@ def unwrap_global(only_selected, context, mw, faces, unwrap_mode, correct_aspect
             y = ((verts_local_face[itr].y / max_dim_y) + 1.0) / 2.0
 
             # scale down to rect
-            top_left = nData.rect_top_left(rect)
-            top_right = nData.rect_top_right(rect)
-            bottom_left = nData.rect_bottom_left(rect)
-
-            x = nMath.lerp((top_left[0] + 1.0) / 2.0, (top_right[0] + 1.0) / 2.0, x, True)
-            y = nMath.lerp((bottom_left[1] + 1.0) / 2.0, (top_left[1] + 1.0) / 2.0, y, True)
+            x = nMath.lerp(top_left[0], top_right[0], x, True)
+            y = nMath.lerp(bottom_left[1], top_left[1], y, True)
 
             uv = mathutils.Vector((x, y))
 
@@ -549,8 +530,8 @@ def unwrap_global(only_selected, context, mw, faces, unwrap_mode, correct_aspect
                     else:
                         factor_y *= aspect
 
-                uv.x = nMath.lerp((rect.topLeftX + 1.0) / 2.0, (rect.topRightX + 1.0) / 2.0, factor_x, True)
-                uv.y = nMath.lerp((rect.bottomLeftY + 1.0) / 2.0, (rect.topLeftY + 1.0) / 2.0, factor_y, True)
+                uv.x = nMath.lerp(top_left[0], top_right[0], factor_x, True)
+                uv.y = nMath.lerp(bottom_left[1], top_left[1], factor_y, True)
 
 # endregion
 
@@ -620,7 +601,7 @@ class UtilOpNeoSetUvRect(UtilOpMeshOperator):
         correct_aspect = bpy.context.scene.nuv_settings.correct_aspect_ratio
         snap_mode = bpy.context.scene.nuv_settings.snap_mode
         collection = bpy.context.scene.nuv_uvSets[self.collectionIdx]
-        rect = collection.items[self.rectIdx]
+        rect_uvs = nRectTable.get_table(collection).get_uvs(self.rectIdx)
 
         # parent object data
         obj = bpy.context.object
@@ -630,7 +611,7 @@ class UtilOpNeoSetUvRect(UtilOpMeshOperator):
         layer = bm.loops.layers.uv
         uv_layer = layer.verify()
 
-        unwrap_auto(space_mode, in_edit_mode, context, mw, bm.faces, unwrap_mode, correct_aspect, snap_mode, rect,
+        unwrap_auto(space_mode, in_edit_mode, context, mw, bm.faces, unwrap_mode, correct_aspect, snap_mode, rect_uvs,
                     uv_layer)
 
 
@@ -648,8 +629,8 @@ class UtilOpNeoSetUvRectNormal(UtilOpMeshOperator):
         correct_aspect = bpy.context.scene.nuv_settings.correct_aspect_ratio
         snap_mode = bpy.context.scene.nuv_settings.snap_mode
 
-        # create dummy rect
-        rect = nData.NeoRect((-1, 1), (1, 1), (-1, -1), (1, -1))
+        # the whole uv space
+        rect_uvs = nRectTable.unit_uvs
 
         # parent object data
         obj = bpy.context.object
@@ -659,7 +640,7 @@ class UtilOpNeoSetUvRectNormal(UtilOpMeshOperator):
         layer = bm.loops.layers.uv
         uv_layer = layer.verify()
 
-        unwrap_auto(space_mode, in_edit_mode, context, mw, bm.faces, unwrap_mode, correct_aspect, snap_mode, rect,
+        unwrap_auto(space_mode, in_edit_mode, context, mw, bm.faces, unwrap_mode, correct_aspect, snap_mode, rect_uvs,
                     uv_layer)
 
 
@@ -692,8 +673,8 @@ class UtilOpNeoPatternUnwrap(UtilOpMeshOperator):
         collection = bpy.context.scene.nuv_uvSets[self.collectionIdx]
         pattern = collection.get_active_pattern()
 
-        items = pattern.items.items()
-        pattern_len = len(items)
+        rect_indices = pattern.get_rect_indices()
+        pattern_len = len(rect_indices)
 
         # parent object data
         obj = bpy.context.object
@@ -703,18 +684,18 @@ class UtilOpNeoPatternUnwrap(UtilOpMeshOperator):
         layer = bm.loops.layers.uv
         uv_layer = layer.verify()
 
+        table = nRectTable.get_table(collection)
+
         for face in bm.faces:
             idx = random.randrange(0, pattern_len)
 
-            pattern_rect = items[idx][1]
+            rect_idx = rect_indices[idx]
 
-            if pattern_rect.rect_idx < 0:
+            if not -1 < rect_idx < len(table):
                 continue
 
-            rect = pattern_rect.get_rect(collection)
-
             unwrap_local(in_edit_mode, context, mw, {face}, unwrap_mode, correct_aspect, snap_mode,
-                        rect, uv_layer)
+                        table.get_uvs(rect_idx), uv_layer)
 
 
 class UtilOpNeoRotUv(UtilOpMeshOperator):
@@ -860,12 +841,22 @@ class UtilOpNeoUvReload(bpy.types.Operator):
             self.report({"ERROR"}, "The file \"" + path + "\" no longer exists.")
             return {"CANCELLED"}
 
-        report = nData.ImportRectData.import_file(path)
+        # validate the header before doing any work, a valid sidecar means it was already validated
+        if nData.read_sidecar(path, header_only=True) is None:
+            try:
+                nProject.inspect(path)
+            except nProject.ProjectFileError as e:
+                self.report({"ERROR"}, "Not a valid tile map project file: " + str(e))
+                return {"CANCELLED"}
+
+        report, summary = nData.ImportRectData.import_file(path)
         for r in report:
             if r == "CANCELLED":
                 self.report({"ERROR"}, "Not a valid tile map project file.")
+            else:
+                self.report({"INFO"}, "Reloaded tile map: " + str(summary))
 
-        print("Reloaded Tile Map: " + path)
+        print("Reloaded Tile Map: " + path + " (" + str(summary) + ")")
         return report
 
 # endregion
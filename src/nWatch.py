@@ -0,0 +1,171 @@
+# region Imports
+
+import bpy
+import os
+import time
+from . import nData
+
+# endregion
+
+# region Settings
+
+# how often the watcher checks whether it's been turned on, in seconds
+idle_interval = 1.0
+
+# the last seen (mtime, size) of each watched project file by absolute path
+stats = {}
+
+# project files that changed on the last check, reloaded once they stop changing
+changed = set()
+
+# the state of each project file shown in the sidebar by absolute path, as the time it was checked, the stamps of the
+# file, its sidecar and the chunk index of its collection, and the state
+states = {}
+
+# how often the sidebar checks a project file again, in seconds
+state_interval = 1.0
+
+# endregion
+
+# region Methods
+
+
+def get_watched_paths(scene):
+    """Returns the local collections of a scene by the absolute path of their project file."""
+    return {os.path.abspath(c.relative_path): c for c in scene.nuv_uvSets if c.relative_path and not c.is_linked()}
+
+
+def stat_file(path):
+    """Returns the (mtime, size) stamp of a file, or None if it doesn't exist."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    return stat.st_mtime_ns, stat.st_size
+
+
+def get_project_state(path, collection):
+    """Returns "MISSING" if the project file of a collection doesn't exist, or nData.get_project_state otherwise. It's
+    meant for drawing, so each file is only stat'ed once every state_interval and its sidecar is only read again once
+    it, the file or the chunk index of the collection changed."""
+    now = time.monotonic()
+    entry = states.get(path)
+
+    if entry is not None and now - entry[0] < state_interval:
+        return entry[2]
+
+    chunks = tuple((c.name, c.contentHash, c.offset) for c in collection.chunks)
+    stamps = stat_file(path), stat_file(nData.get_sidecar_path(path)), chunks
+
+    if entry is not None and entry[1] == stamps:
+        state = entry[2]
+    elif stamps[0] is None:
+        state = "MISSING"
+    else:
+        state = nData.get_project_state(path, collection)
+
+    states[path] = (now, stamps, state)
+    return state
+
+
+def check_projects():
+    """Stats every watched project file once and reloads the collections of files that changed.
+
+    A file is only reloaded once its stamp is the same on two checks in a row, so a file that's still being written
+    isn't read half way through.
+    """
+    scene = bpy.context.scene
+    settings = getattr(scene, "nuv_settings", None) if scene is not None else None
+
+    if settings is None or not settings.watch_projects:
+        stats.clear()
+        changed.clear()
+        return idle_interval
+
+    paths = get_watched_paths(scene)
+    reloaded = False
+
+    for path, collection in paths.items():
+        stamp = stat_file(path)
+        last = stats.get(path)
+        stats[path] = stamp
+
+        if stamp is None:
+            changed.discard(path)
+            continue
+
+        if last is None:
+            # first time we see the file, it only needs reloading if the collection doesn't match it. the sidecar is
+            # shared by every blend file, so it being valid only means some blend file imported the current version
+            sidecar = nData.read_sidecar(path, header_only=True)
+            if sidecar is None or not nData.ImportRectData.is_up_to_date(collection, sidecar):
+                changed.add(path)
+        elif stamp != last:
+            changed.add(path)
+        elif path in changed:
+            try:
+                reloaded = reload_project(path) or reloaded
+            except Exception as e:
+                # keep it changed to try again on the next check, the timer stops for good if it raises
+                print("Couldn't reload Tile Map: " + path + " (" + str(e) + ")")
+                continue
+
+            changed.discard(path)
+
+    # forget files that aren't watched anymore
+    for path in list(stats):
+        if path not in paths:
+            del stats[path]
+            changed.discard(path)
+
+    if reloaded:
+        for area in bpy.context.screen.areas if bpy.context.screen else []:
+            if area.type == "VIEW_3D":
+                area.tag_redraw()
+
+    return settings.watch_interval
+
+
+def reload_project(path):
+    """Differentially reloads the collection of a changed project file, returning whether it was reloaded."""
+    report, summary = nData.ImportRectData.import_file(path)
+
+    if "FINISHED" not in report:
+        print("Couldn't reload Tile Map: " + path)
+        return False
+
+    print("Reloaded Tile Map: " + path + " (" + str(summary) + ")")
+    return True
+
+
+def reset():
+    stats.clear()
+    changed.clear()
+    states.clear()
+
+
+@bpy.app.handlers.persistent
+def on_load_post(_):
+    reset()
+
+# endregion
+
+# region Blender
+
+
+def register():
+    bpy.app.timers.register(check_projects, first_interval=idle_interval, persistent=True)
+    bpy.app.handlers.load_post.append(on_load_post)
+
+
+def unregister():
+    if bpy.app.timers.is_registered(check_projects):
+        bpy.app.timers.unregister(check_projects)
+
+    if on_load_post in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(on_load_post)
+
+    reset()
+
+# endregion
@@ -0,0 +1,160 @@
+"""
+Tests for reading project files. Run from the repository root with:
+    python -m pytest tests
+"""
+
+import hashlib
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import nProject
+
+
+def make_chunks(count, preview_size=64):
+    """Returns the atlas and uvs chunks of a project with count rects, with previews that don't compress to nothing."""
+    rng = np.random.default_rng(count)
+    verts = rng.random((count, 8), dtype=np.float32)
+    previews = [rng.integers(0, 256, preview_size, dtype=np.uint8).tobytes() for _ in range(count)]
+
+    return [
+        ("atlas", nProject.pack_atlas(16, 16, bytes(range(256)))),
+        ("uvs", nProject.pack_uvs(verts, previews)),
+    ], verts, previews
+
+
+def read_project(filepath):
+    """Returns the tile size, atlas png, vertices and preview pngs of a project as plain python objects."""
+    with nProject.ProjectReader(filepath) as reader:
+        atlas = reader.read_atlas(reader.get_chunk("atlas"))
+        uvs = reader.read_uvs(reader.get_chunk("uvs"))
+
+        result = ((atlas.tile_width, atlas.tile_height), bytes(atlas.png), np.array(uvs.verts),
+                  [bytes(p) for p in uvs.previews])
+        del atlas, uvs
+
+    return result
+
+
+def rewrite_stream(filepath, claimed_size=None, stream_len=None):
+    """Changes the uncompressed length the uvs chunk claims, or cuts its zlib stream short, keeping the chunk table
+    valid."""
+    with nProject.ProjectReader(filepath) as reader:
+        chunk = reader.get_chunk("uvs")
+        start, end = chunk.dataAddress, chunk.dataAddress + chunk.dataLen
+
+    with open(filepath, "rb") as f:
+        data = f.read()
+
+    size = nProject.int64.unpack_from(data, start)[0] if claimed_size is None else claimed_size
+    stream = data[start + nProject.int64.size:end]
+    if stream_len is not None:
+        stream = stream[:stream_len]
+
+    payload = nProject.int64.pack(size) + stream
+    header_start = start - nProject.int64.size
+
+    with open(filepath, "wb") as f:
+        f.write(data[:header_start] + nProject.int64.pack(len(payload)) + payload + data[end:])
+
+
+def test_compressed_chunks_read_back_the_same(tmp_path):
+    chunks, verts, previews = make_chunks(200)
+    plain = str(tmp_path / "plain.tmprj")
+    compressed = str(tmp_path / "compressed.tmprj")
+
+    nProject.write_project(plain, 1, chunks)
+    nProject.write_project(compressed, 1, chunks, {"atlas", "uvs"})
+
+    with nProject.ProjectReader(compressed) as reader:
+        assert [(c.name, c.compressed) for c in reader.chunks] == [("atlas", True), ("uvs", True)]
+
+    plain_result = read_project(plain)
+    compressed_result = read_project(compressed)
+
+    assert plain_result[:2] == compressed_result[:2]
+    assert np.array_equal(plain_result[2], compressed_result[2])
+    assert np.array_equal(compressed_result[2], verts)
+    assert plain_result[3] == compressed_result[3] == previews
+
+
+def test_compressed_chunk_spanning_blocks(tmp_path):
+    # previews of random bytes barely compress, so the stream is several decompress blocks long
+    chunks, verts, previews = make_chunks(64, nProject.decompress_block_size // 16)
+    filepath = str(tmp_path / "large.tmprj")
+    nProject.write_project(filepath, 1, chunks, {"uvs"})
+
+    _, _, read_verts, read_previews = read_project(filepath)
+
+    assert np.array_equal(read_verts, verts)
+    assert read_previews == previews
+
+
+def test_compressed_chunk_longer_than_claimed(tmp_path):
+    chunks, _, _ = make_chunks(50)
+    filepath = str(tmp_path / "long.tmprj")
+    nProject.write_project(filepath, 1, chunks, {"uvs"})
+    rewrite_stream(filepath, claimed_size=100)
+
+    with pytest.raises(nProject.ProjectFileError, match="longer than it claims"):
+        read_project(filepath)
+
+
+def test_truncated_compressed_chunk(tmp_path):
+    chunks, _, _ = make_chunks(50)
+    filepath = str(tmp_path / "truncated.tmprj")
+    nProject.write_project(filepath, 1, chunks, {"uvs"})
+    rewrite_stream(filepath, stream_len=100)
+
+    with pytest.raises(nProject.ProjectFileError, match="truncated"):
+        read_project(filepath)
+
+
+def write_damaged_project(filepath):
+    """Writes a project whose compressed uvs chunk has a damaged zlib stream."""
+    previews = [bytes(range(256)) * 4 for _ in range(16)]
+    nProject.write_project(filepath, 1, [("uvs", nProject.pack_uvs(np.zeros((16, 8)), previews))], {"uvs"})
+
+    with nProject.ProjectReader(filepath) as reader:
+        stream_start = reader.get_chunk("uvs").dataAddress + nProject.int64.size
+
+    with open(filepath, "r+b") as f:
+        f.seek(stream_start + 2)
+        f.write(b"\xff" * 16)
+
+
+def test_corrupt_compressed_chunk_closes_cleanly(tmp_path):
+    filepath = str(tmp_path / "damaged.tmprj")
+    write_damaged_project(filepath)
+
+    with pytest.raises(nProject.ProjectFileError):
+        with nProject.ProjectReader(filepath) as reader:
+            reader.read_uvs(reader.get_chunk("uvs"))
+
+
+def test_preview_names_fit_blender_names():
+    preview_hash = hashlib.sha256(b"preview").hexdigest()
+
+    for tile_map_name in ("Tiles", "T" * 31, "T" * 32, "T" * 80, "é" * 40):
+        name = nProject.preview_image_name(tile_map_name, preview_hash)
+        assert len(name.encode("utf-8")) <= nProject.max_name_bytes
+        assert name.endswith(preview_hash[:nProject.preview_hash_digits])
+
+    assert nProject.preview_image_name("Tiles", preview_hash) == ".Atlas_Tiles_Preview_" + preview_hash[:16]
+
+
+def test_long_preview_names_stay_unique():
+    preview_hash = hashlib.sha256(b"preview").hexdigest()
+    other_hash = hashlib.sha256(b"other").hexdigest()
+    long_name = "Tiles_" * 12
+
+    names = {
+        nProject.preview_image_name(long_name + "A", preview_hash),
+        nProject.preview_image_name(long_name + "B", preview_hash),
+        nProject.preview_image_name(long_name + "A", other_hash),
+    }
+
+    assert len(names) == 3
@@ -0,0 +1,117 @@
+"""
+Benchmarks parsing and importing generated tile map projects of increasing size.
+
+Parsing is benchmarked with any Python that has numpy. Importing needs Blender, run it from the repository root with:
+    blender --background --factory-startup --python tools/bench_import.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+repo_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+src_path = os.path.join(repo_path, "src")
+
+try:
+    import bpy
+except ImportError:
+    bpy = None
+
+if bpy is not None:
+    sys.path.insert(0, repo_path)
+    import src as neotilemap
+    from src import nData, nPng, nProject
+else:
+    sys.path.insert(0, src_path)
+    import nPng
+    import nProject
+
+sizes = (1000, 2500, 5000, 10000, 20000)
+pattern_entries = 200
+
+
+def make_project(filepath, count):
+    """Writes a project with count non overlapping rects, each with its own preview."""
+    columns = int(np.ceil(np.sqrt(count)))
+    size = 2.0 / columns
+
+    verts = np.empty((count, 8), dtype=np.float32)
+    previews = []
+
+    for i in range(count):
+        left = -1.0 + (i % columns) * size
+        bottom = -1.0 + (i // columns) * size
+        right = left + size
+        top = bottom + size
+
+        verts[i] = (left, top, right, top, right, bottom, left, bottom)
+        previews.append(nPng.encode(2, 2, bytes([i & 0xFF, (i >> 8) & 0xFF, 0, 255]) * 4))
+
+    atlas = nPng.encode(4, 4, bytes([128, 128, 128, 255]) * 16)
+    nProject.write_project(filepath, 1, [
+        ("atlas", nProject.pack_atlas(16, 16, atlas)),
+        ("uvs", nProject.pack_uvs(verts, previews)),
+    ])
+
+    return verts
+
+
+def bench_parse(filepath, count):
+    start = time.perf_counter()
+
+    with nProject.ProjectReader(filepath) as reader:
+        uvs = reader.read_uvs(reader.get_chunk("uvs"))
+        index = {nProject.rect_key(v): i for i, v in enumerate(uvs.verts.tolist())}
+
+    elapsed = time.perf_counter() - start
+    assert len(index) == count
+    return elapsed
+
+
+def bench_import(filepath, count, verts):
+    scene = bpy.context.scene
+    scene.nuv_uvSets.clear()
+
+    # seed a collection with a pattern so pattern resolution is part of the import
+    collection = nData.ImportRectData.add_collection(os.path.splitext(os.path.basename(filepath))[0], filepath)
+    pattern = collection.patterns.add()
+    for i in range(pattern_entries):
+        entry = pattern.items.add()
+        entry.apply_tuples(*verts[(i * 7919) % count].reshape(4, 2)[[0, 1, 3, 2]].tolist())
+
+    start = time.perf_counter()
+    report, summary = nData.ImportRectData.import_file(filepath)
+    first = time.perf_counter() - start
+
+    start = time.perf_counter()
+    nData.ImportRectData.import_file(filepath)
+    second = time.perf_counter() - start
+
+    assert "FINISHED" in report and summary.added == count
+    return first, second
+
+
+def main():
+    if bpy is not None:
+        neotilemap.register()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        print("rects     parse   us/rect    import   us/rect    reload")
+
+        for count in sizes:
+            filepath = os.path.join(temp_dir, "bench_" + str(count) + ".tmprj")
+            verts = make_project(filepath, count)
+
+            parse = bench_parse(filepath, count)
+            line = f"{count:>5}  {parse:8.3f}  {parse / count * 1e6:8.2f}"
+
+            if bpy is not None:
+                first, second = bench_import(filepath, count, verts)
+                line += f"  {first:8.3f}  {first / count * 1e6:8.2f}  {second:8.3f}"
+
+            print(line)
+
+
+main()
@@ -0,0 +1,104 @@
+"""
+Compares finding the rect under uv positions with the spatial index against testing every rect, like picking a rect
+from a face used to.
+
+Run from the repository root with any Python that has numpy:
+    python tools/bench_spatial.py [--rects 10000] [--points 2000] [--seed 0]
+
+Rects are laid out like an atlas of evenly sized tiles, with a few larger rects spanning several tiles on top.
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+repo_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(repo_path, "src"))
+
+import nRectGrid
+
+
+def make_rects(count, rng):
+    """Returns a (count, 8) float32 array of rect vertices in file order from -1 to 1."""
+    columns = math.ceil(math.sqrt(count))
+    size = 2.0 / columns
+    verts = np.empty((count, 8), dtype=np.float32)
+
+    for i in range(count):
+        if i % 50 == 49:
+            # a rect spanning several tiles
+            left = rng.uniform(-1.0, 1.0 - size * 3)
+            bottom = rng.uniform(-1.0, 1.0 - size * 3)
+            right, top = left + size * 3, bottom + size * 2
+        else:
+            left = -1.0 + (i % columns) * size
+            bottom = -1.0 + (i // columns) * size
+            right, top = left + size, bottom + size
+
+        verts[i] = (left, top, right, top, right, bottom, left, bottom)
+
+    return verts
+
+
+def find_linear(rects, x, y):
+    """The linear scan, testing rects in order like nData.rect_contains."""
+    for i, (tlx, tly, trx, _, _, _, _, bly) in enumerate(rects):
+        if (tlx + 1) / 2 < x < (trx + 1) / 2 and (bly + 1) / 2 < y < (tly + 1) / 2:
+            return i
+
+    return -1
+
+
+def time_call(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the rect spatial index against a linear scan.")
+    parser.add_argument("--rects", type=int, default=10000)
+    parser.add_argument("--points", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    verts = make_rects(args.rects, rng)
+    rects = verts.tolist()
+
+    xs = np.array([rng.random() for _ in range(args.points)])
+    ys = np.array([rng.random() for _ in range(args.points)])
+
+    uvs = (verts.astype(np.float64) + 1.0) / 2.0
+    bounds = np.stack((uvs[:, 0::2].min(axis=1), uvs[:, 1::2].min(axis=1),
+                       uvs[:, 0::2].max(axis=1), uvs[:, 1::2].max(axis=1)), axis=1)
+
+    grid, build_time = time_call(nRectGrid.RectGrid, uvs, bounds)
+
+    linear, linear_time = time_call(lambda: [find_linear(rects, x, y) for x, y in zip(xs.tolist(), ys.tolist())])
+    single, single_time = time_call(lambda: [grid.find(x, y) for x, y in zip(xs.tolist(), ys.tolist())])
+    batch, batch_time = time_call(grid.find_many, xs, ys)
+
+    if linear != single or linear != batch.tolist():
+        print("The spatial index disagrees with the linear scan!")
+        return 1
+
+    def per_point(seconds):
+        return "{:10.2f} us per point".format(seconds / args.points * 1e6)
+
+    print(str(args.rects) + " rects in a " + str(grid.cells_x) + "x" + str(grid.cells_y) + " grid, "
+          + str(args.points) + " points, " + str(sum(i > -1 for i in linear)) + " hits")
+    print("build        {:10.2f} ms".format(build_time * 1e3))
+    print("linear scan  " + per_point(linear_time))
+    print("grid         " + per_point(single_time) + "  {:8.1f}x".format(linear_time / single_time))
+    print("grid batch   " + per_point(batch_time) + "  {:8.1f}x".format(linear_time / batch_time))
+
+    return 0
+
+
+sys.exit(main())
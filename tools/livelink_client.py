@@ -0,0 +1,127 @@
+"""
+Stands in for the Tilemap Builder on the live link, sending rect changes to Blender without the real tool.
+
+Turn on Live Link in the sidebar settings, then run from the repository root with any Python that has numpy:
+    python tools/livelink_client.py demo [--collection NAME] [--port PORT]
+    python tools/livelink_client.py project path/to/project.tmprj [--port PORT]
+
+demo adds a grid of rects, then moves, recolors and removes some of them and replaces the atlas. project sends every
+rect and the atlas of a project file, as if the builder had just created it.
+"""
+
+import argparse
+import json
+import os
+import socket
+import struct
+import sys
+import time
+
+repo_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(repo_path, "src"))
+
+import nPng
+import nProject
+
+# must match nLiveLink
+message_magic = b"NTLL"
+message_header = struct.Struct("<4sII")
+default_port = 47651
+
+
+def send_message(sock, header, payload=b""):
+    data = json.dumps(header).encode("utf-8")
+    sock.sendall(message_header.pack(message_magic, len(data), len(payload)) + data + payload)
+
+
+def make_preview(r, g, b):
+    return nPng.encode(4, 4, bytes([r, g, b, 255]) * 16)
+
+
+def rect_verts(left, bottom, right, top):
+    """Returns the vertices of a rect in project file order."""
+    return [left, top, right, top, right, bottom, left, bottom]
+
+
+def run_demo(sock, collection, delay):
+    columns = 8
+    size = 2.0 / columns
+    verts = []
+
+    print("Adding " + str(columns * columns) + " rects")
+    for i in range(columns * columns):
+        left = -1.0 + (i % columns) * size
+        bottom = -1.0 + (i // columns) * size
+        verts.append(rect_verts(left, bottom, left + size, bottom + size))
+
+        send_message(sock, {"type": "rect_add", "collection": collection, "verts": verts[-1]},
+                     make_preview(i * 4 % 256, 128, 255 - i * 4 % 256))
+
+    time.sleep(delay)
+
+    print("Replacing the atlas")
+    send_message(sock, {"type": "atlas", "collection": collection}, make_preview(64, 64, 64))
+
+    time.sleep(delay)
+
+    print("Moving the first row up by half a rect")
+    for i in range(columns):
+        moved = [v + size * 0.5 if n % 2 == 1 else v for n, v in enumerate(verts[i])]
+        send_message(sock, {"type": "rect_move", "collection": collection, "verts": verts[i], "to": moved})
+        verts[i] = moved
+
+    time.sleep(delay)
+
+    print("Recoloring the second row")
+    for i in range(columns, columns * 2):
+        send_message(sock, {"type": "preview", "collection": collection, "verts": verts[i]}, make_preview(255, 0, 0))
+
+    time.sleep(delay)
+
+    print("Removing the last row")
+    for i in range(columns * (columns - 1), columns * columns):
+        send_message(sock, {"type": "rect_remove", "collection": collection, "verts": verts[i]})
+
+
+def run_project(sock, filepath):
+    collection = os.path.splitext(os.path.basename(filepath))[0]
+
+    with nProject.ProjectReader(filepath) as reader:
+        atlas_chunk = reader.get_chunk("atlas")
+        if atlas_chunk is not None:
+            send_message(sock, {"type": "atlas", "collection": collection}, bytes(reader.read_atlas(atlas_chunk).png))
+
+        uvs_chunk = reader.get_chunk("uvs")
+        if uvs_chunk is None:
+            return
+
+        uvs = reader.read_uvs(uvs_chunk)
+        for verts, png in zip(uvs.verts.tolist(), uvs.previews):
+            send_message(sock, {"type": "rect_add", "collection": collection, "verts": verts}, bytes(png))
+
+        print("Sent " + str(len(uvs.previews)) + " rects to \"" + collection + "\"")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sends rect changes to the NeoTileMap live link.")
+    parser.add_argument("--port", type=int, default=default_port)
+
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    demo = commands.add_parser("demo", help="Add, move, recolor and remove a grid of rects.")
+    demo.add_argument("--collection", default="LiveLink")
+    demo.add_argument("--delay", type=float, default=1.0, help="Seconds to wait between steps.")
+
+    project = commands.add_parser("project", help="Send every rect of a project file.")
+    project.add_argument("filepath")
+
+    args = parser.parse_args()
+
+    with socket.create_connection(("127.0.0.1", args.port)) as sock:
+        if args.command == "demo":
+            run_demo(sock, args.collection, args.delay)
+        else:
+            run_project(sock, args.filepath)
+
+
+main()